@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Archive binaire compacte des parties jouées
+Un fichier d'archive commence par une signature, puis les parties s'y
+ajoutent les unes après les autres, chacune précédée de sa longueur.
+Un fichier d'index voisin (même nom suivi de .idx) donne la position de
+chaque partie pour la retrouver sans lire celles qui la précèdent ; une
+partie y est notée après avoir été écrite, les 2 fichiers vidés ensuite.
+Les archives de la première version (signature BEL1, nombre de donnes
+sur 1 octet) restent lisibles.
+
+Une partie est enregistrée ainsi (entiers petit-boutistes) :
+- nombre de donnes (2 octets), puis pour chaque donne :
+  - preneur, atout, valeur du contrat / 10 et place qui entame (4 octets,
+    255 pour une donne sans contrat),
+  - nombre de plis (1 octet), puis pour chaque pli les rangs des cartes
+    dans l'ordre où elles ont été posées (4 octets),
+  - mains distribuées (4 x 4 octets) pour une donne sans pli seulement,
+    sinon elles se déduisent des plis,
+  - points de chaque place (4 x 2 octets),
+- points totaux de chaque place (4 x 4 octets) et champions (1 octet, 1 bit par place).
+Une donne jouée tient en 45 octets.
+
+L'archiveur s'ajoute aux enregistreurs d'une partie : elle lui passe
+chaque donne finie puis la partie terminée. Le lecteur projette l'archive
+et son index en mémoire (mmap) et ne décode que la partie demandée : sa
+mémoire ne croît pas avec la taille de l'archive. Sans index, il le
+reconstruit en mémoire en suivant les longueurs des parties.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import mmap
+import os
+import struct
+
+from belote import gagnant
+
+SIGNATURE = 'BEL2'
+AUCUN = 255
+# nombre de donnes d'une partie, selon la signature de l'archive
+NB_DONNES = {'BEL1': struct.Struct('<B'), SIGNATURE: struct.Struct('<H')}
+LONGUEUR = struct.Struct('<I')
+POSITION = struct.Struct('<Q')
+ENTETE_DONNE = struct.Struct('<BBBBB')
+PLI = struct.Struct('<4B')
+MAINS = struct.Struct('<4I')
+SCORES = struct.Struct('<4h')
+TOTAUX = struct.Struct('<4iB')
+
+
+def coder_donne(une_donne):
+    """ retourne l'enregistrement binaire d'une donne finie """
+    joueurs = list(une_donne.joueurs)
+    contrat = getattr(une_donne, 'contrat', None)
+    if contrat is not None:
+        entete = (contrat.preneur, contrat.atout, contrat.valeur // 10,
+                  une_donne.premier, len(une_donne.plis))
+    else:
+        entete = (AUCUN, AUCUN, AUCUN, getattr(une_donne, 'premier', 0), len(une_donne.plis))
+    morceaux = [ENTETE_DONNE.pack(*entete)]
+    for pli in une_donne.plis:
+        morceaux.append(PLI.pack(*[carte.rang for _, carte in pli]))
+    if not une_donne.plis:
+        morceaux.append(MAINS.pack(*getattr(une_donne, 'mains_initiales', (0, 0, 0, 0))))
+    morceaux.append(SCORES.pack(*[une_donne.scores.get(joueur, 0) for joueur in joueurs]))
+    return ''.join(morceaux)
+
+def coder_partie(donnes, joueurs, feuille_de_points):
+    """ retourne l'enregistrement binaire d'une partie à partir de ses donnes codées """
+    champions = 0
+    for siege, joueur in enumerate(joueurs):
+        if joueur in feuille_de_points.champions:
+            champions |= 1 << siege
+    totaux = TOTAUX.pack(*([feuille_de_points.get(joueur, 0) for joueur in joueurs] + [champions]))
+    return NB_DONNES[SIGNATURE].pack(len(donnes)) + ''.join(donnes) + totaux
+
+def decoder_partie(tampon, position = 0, signature = SIGNATURE):
+    """ retourne la partie enregistrée à la position donnée d'un tampon """
+    nombre = NB_DONNES[signature]
+    nb_donnes = nombre.unpack_from(tampon, position)[0]
+    position = position + nombre.size
+    donnes = []
+    for _ in range(nb_donnes):
+        preneur, atout, valeur, premier, nb_plis = ENTETE_DONNE.unpack_from(tampon, position)
+        position = position + ENTETE_DONNE.size
+        contrat = None if preneur == AUCUN else (preneur, atout, valeur * 10)
+        plis = []
+        mains = [0, 0, 0, 0]
+        entame = premier
+        for _ in range(nb_plis):
+            rangs = PLI.unpack_from(tampon, position)
+            position = position + PLI.size
+            plis.append([((entame + indice) % 4, rang) for indice, rang in enumerate(rangs)])
+            for siege, rang in plis[-1]:
+                mains[siege] |= 1 << rang
+            if contrat is not None:
+                # le gagnant du pli entame le suivant
+                entame = (entame + gagnant(rangs, atout)) % 4
+        if not nb_plis:
+            mains = list(MAINS.unpack_from(tampon, position))
+            position = position + MAINS.size
+        scores = list(SCORES.unpack_from(tampon, position))
+        position = position + SCORES.size
+        donnes.append({'contrat': contrat, 'premier': premier, 'mains': mains,
+                       'plis': plis, 'scores': scores})
+    totaux = TOTAUX.unpack_from(tampon, position)
+    return {'donnes': donnes, 'points': list(totaux[:4]),
+            'champions': [siege for siege in range(4) if totaux[4] >> siege & 1]}
+
+
+class Archiveur(object):
+    """ Ajoute les parties terminées à la fin d'une archive """
+    def __init__(self, chemin):
+        nouveau = not os.path.exists(chemin) or not os.path.getsize(chemin)
+        if not nouveau:
+            with open(chemin, 'rb') as fichier:
+                if fichier.read(len(SIGNATURE)) != SIGNATURE:
+                    raise ValueError("{} n'est pas une archive de parties de cette "
+                                     "version".format(chemin))
+        self.fichier = open(chemin, 'ab')
+        self.index = open(chemin + '.idx', 'ab')
+        if nouveau:
+            self.fichier.write(SIGNATURE)
+        self.position = self.fichier.tell()
+        # les donnes de la partie en cours, déjà codées
+        self.donnes = []
+
+    def noter_donne(self, une_donne):
+        """ retient une donne finie de la partie en cours """
+        self.donnes.append(coder_donne(une_donne))
+
+    def ecrire(self, une_partie):
+        """ ajoute la partie terminée à l'archive """
+        enregistrement = coder_partie(self.donnes, une_partie.joueurs,
+                                      une_partie.feuille_de_points)
+        self.donnes = []
+        # la partie d'abord : l'index ne désigne jamais une partie absente
+        self.fichier.write(LONGUEUR.pack(len(enregistrement)))
+        self.fichier.write(enregistrement)
+        self.fichier.flush()
+        self.index.write(POSITION.pack(self.position))
+        self.index.flush()
+        self.position = self.position + LONGUEUR.size + len(enregistrement)
+
+    def fermer(self):
+        self.fichier.close()
+        self.index.close()
+
+class Lecteur(object):
+    """ Lit les parties d'une archive projetée en mémoire """
+    def __init__(self, chemin):
+        self.fichier = open(chemin, 'rb')
+        self.tampon = mmap.mmap(self.fichier.fileno(), 0, access = mmap.ACCESS_READ)
+        self.signature = self.tampon[:len(SIGNATURE)]
+        if self.signature not in NB_DONNES:
+            raise ValueError("{} n'est pas une archive de parties".format(chemin))
+        self.index = None
+        if os.path.exists(chemin + '.idx') and os.path.getsize(chemin + '.idx'):
+            # projeté comme l'archive : rien n'est lu d'avance
+            self.index = open(chemin + '.idx', 'rb')
+            self.positions = mmap.mmap(self.index.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            self.positions = self.indexer()
+
+    def indexer(self):
+        """ retrouve la position des parties en suivant leurs longueurs """
+        positions = []
+        position = len(SIGNATURE)
+        while position < len(self.tampon):
+            positions.append(POSITION.pack(position))
+            position = position + LONGUEUR.size + LONGUEUR.unpack_from(self.tampon, position)[0]
+        return ''.join(positions)
+
+    def __len__(self):
+        return len(self.positions) // POSITION.size
+
+    def __getitem__(self, numero):
+        if numero < 0:
+            numero = numero + len(self)
+        if not 0 <= numero < len(self):
+            raise IndexError(numero)
+        position = POSITION.unpack_from(self.positions, numero * POSITION.size)[0]
+        return decoder_partie(self.tampon, position + LONGUEUR.size, self.signature)
+
+    def __iter__(self):
+        for numero in xrange(len(self)):
+            yield self[numero]
+
+    def fermer(self):
+        self.tampon.close()
+        self.fichier.close()
+        if self.index is not None:
+            self.positions.close()
+            self.index.close()
+
+
+if __name__=='__main__':
+    import tempfile
+    from modele import Table, Joueur
+    from belote import Belote
+    print "tests de l'archive"
+    chemin = os.path.join(tempfile.mkdtemp(), 'parties.bel')
+    archiveur = Archiveur(chemin)
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    for graine in range(100):
+        une_table.dedier(Belote(), graine)
+        une_table.partie.enregistreurs.append(archiveur)
+        une_table.jouer()
+    # une longue partie : plus de 255 donnes
+    une_table.dedier(Belote(nb_max_points = 0, nb_max_donnes = 300), 100)
+    une_table.partie.enregistreurs.append(archiveur)
+    une_table.jouer()
+    archiveur.fermer()
+    lecteur = Lecteur(chemin)
+    print len(lecteur), "parties,", os.path.getsize(chemin) // len(lecteur), "octets par partie"
+    partie = lecteur[-1]
+    print "longue partie : ", len(partie['donnes']), "donnes, points = ", partie['points'], \
+          "champions = ", partie['champions']
+    print "dernière donne = ", partie['donnes'][-1]['scores'], partie['donnes'][-1]['contrat']
+    print "points de la table = ", [une_table.feuille_de_points[j] for j in une_table.joueurs]
+    lecteur.fermer()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai des performances du jeu
+Il mesure, avec des graines fixes :
+- la construction d'une Donne,
+- chaque étape du plan d'une donne (battre, distribuer, jouer, compter),
+- le déroulement d'une Partie complète,
+- la diffusion d'un changement d'un Observable à ses abonnés,
+- l'affichage d'une table par la vue Console.
+Donnes et parties sont mesurées pour le jeu générique puis pour la belote
+(mesures préfixées par belote.).
+Chaque essai chronomètre d'un bloc une boucle de n opérations, préparées à
+l'avance : le coût et l'imprécision de l'horloge ne comptent qu'une fois.
+Chaque mesure est le temps par opération du plus rapide des essais, le
+moins perturbé par le reste de la machine.
+La vitesse de la machine elle-même varie (fréquence, autres processus) :
+un étalon, un calcul fixe, est chronométré avant et après chaque série
+de mesures, qui sont rapportées à lui ; chaque mesure retient la médiane
+de plusieurs tours, ramenée au meilleur temps de l'étalon.
+Les mesures sont enregistrées en JSON avec l'étalon et comparées à une
+référence, à vitesse de machine égale : une mesure plus lente que la
+référence au-delà de la tolérance fait échouer le banc.
+
+Utilisation :
+python banc.py [--sortie banc.json] [--reference ref.json] [--tolerance 0.25] [--tours 5]
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import gc
+import json
+import random
+import sys
+import timeit
+from StringIO import StringIO
+
+import modele as m
+from jeu import Jeu, Donne
+from belote import Belote
+from support import Observable
+
+# graine commune à toutes les mesures
+GRAINE = 2017
+# nom de la mesure de l'étalon dans les résultats
+ETALON = 'etalon'
+
+
+def chronometrer(operation, nb_operations, nb_essais = 3, preparer = None):
+    """
+    retourne le temps d'une opération, en secondes, au meilleur des essais
+    preparer retourne le contexte d'une opération : les contextes d'un essai
+    sont tous préparés avant de chronométrer la boucle des opérations
+    """
+    if preparer is None:
+        durees = timeit.repeat(lambda: operation(None), number = nb_operations,
+                               repeat = nb_essais)
+        return min(durees) / nb_operations
+    horloge = timeit.default_timer
+    meilleur = None
+    for _ in xrange(nb_essais):
+        contextes = [preparer() for _ in xrange(nb_operations)]
+        # comme timeit, sans ramasse-miettes pendant la mesure
+        ramasse = gc.isenabled()
+        gc.disable()
+        try:
+            debut = horloge()
+            for contexte in contextes:
+                operation(contexte)
+            duree = horloge() - debut
+        finally:
+            if ramasse:
+                gc.enable()
+        if meilleur is None or duree < meilleur:
+            meilleur = duree
+    return meilleur / nb_operations
+
+def etalonner():
+    """ retourne le temps d'un calcul fixe, témoin de la vitesse de la machine """
+    def calcul():
+        totaux = {}
+        for nombre in xrange(2000):
+            totaux[nombre % 97] = totaux.get(nombre % 97, 0) + nombre
+        return sorted(totaux.values())
+    return chronometrer(lambda c: calcul(), 20)
+
+def mediane(valeurs):
+    """ retourne la médiane d'une liste de nombres """
+    valeurs = sorted(valeurs)
+    milieu = len(valeurs) // 2
+    return valeurs[milieu] if len(valeurs) % 2 else (valeurs[milieu - 1] + valeurs[milieu]) / 2
+
+def nouvelle_table():
+    table = m.Table()
+    table.accueuillir(m.Joueur("un"), m.Joueur("deux"), m.Joueur("trois"), m.Joueur("quatre"))
+    return table
+
+def mesurer_donne(jeu, nb_operations, prefixe = ''):
+    """ construction d'une donne puis chacune de ses étapes """
+    mesures = {}
+    table = nouvelle_table()
+    def construire(contexte):
+        Donne(jeu, table.joueurs, table.tapis, table.pioche)
+        # vider la pioche pour la construction suivante
+        del table.pioche[:]
+    mesures[prefixe + 'donne.construction'] = chronometrer(construire, nb_operations)
+
+    for index, etape in enumerate(jeu.plan_donne):
+        def preparer():
+            # une donne fraîche à sa propre table, déroulée jusqu'à l'étape mesurée
+            table = nouvelle_table()
+            une_donne = Donne(jeu, table.joueurs, table.tapis, table.pioche,
+                              random.Random(GRAINE))
+            for precedente in jeu.plan_donne[:index]:
+                precedente(une_donne)
+            return une_donne
+        mesures[prefixe + 'donne.' + etape.__name__] = chronometrer(etape, nb_operations,
+                                                                    preparer = preparer)
+    return mesures
+
+def mesurer_partie(jeu, nb_operations, prefixe = ''):
+    """ déroulement d'une partie complète """
+    graines = iter(xrange(GRAINE, GRAINE + 10 * nb_operations))
+    def preparer():
+        table = nouvelle_table()
+        table.dedier(jeu, next(graines))
+        return table
+    return {prefixe + 'partie.derouler': chronometrer(lambda t: t.jouer(), nb_operations,
+                                                      preparer = preparer)}
+
+def mesurer_observable(nb_operations, nb_abonnes = 10):
+    """ diffusion d'un changement, sans abonné puis à plusieurs abonnés """
+    mesures = {}
+    observable = Observable()
+    mesures['observable.change.0'] = chronometrer(
+        lambda c: observable.change('coup', carte = None), nb_operations)
+    for _ in xrange(nb_abonnes):
+        observable.subscribe(lambda e: None)
+    mesures['observable.change.{}'.format(nb_abonnes)] = chronometrer(
+        lambda c: observable.change('coup', carte = None), nb_operations)
+    return mesures
+
+def mesurer_console(jeu, nb_operations):
+    """ affichage de la table en cours de pli par la vue Console """
+    # importée ici car elle modifie l'affichage des classes du modèle
+    import vue as v
+    table = nouvelle_table()
+    console = v.Console(table, sortie = StringIO())
+    table.dedier(jeu, GRAINE)
+    console.personnaliser(table)
+    une_donne = table.partie.donne_en_cours
+    une_donne.plan[0](une_donne)
+    une_donne.plan[1](une_donne)
+    for joueur in table.joueurs:
+        table.tapis.append((joueur, joueur.main[0]))
+    def afficher(contexte):
+        console.redessiner(table.tapis, True)
+        # oublier le rendu pour que le suivant soit à nouveau écrit
+        console.derniers_rendus.clear()
+    mesures = {'console.tapis': chronometrer(afficher, nb_operations)}
+    mesures['console.table'] = chronometrer(lambda c: repr(table), nb_operations)
+    return mesures
+
+def mesurer(nb_operations = 200, nb_tours = 5):
+    """ retourne toutes les mesures du banc, médianes de nb_tours tours """
+    random.seed(GRAINE)
+    jeu = Jeu()
+    belote = Belote()
+    # les mesures rapportées à l'étalon, et le meilleur temps de l'étalon
+    relatives = {}
+    etalons = []
+    def garder(serie, *arguments):
+        avant = etalonner()
+        nouvelles = serie(*arguments)
+        etalon = (avant + etalonner()) / 2
+        etalons.append(etalon)
+        for nom, valeur in nouvelles.iteritems():
+            relatives.setdefault(nom, []).append(valeur / etalon)
+    # les mesures sont faites tour à tour : un ralentissement passager
+    # de la machine ne touche qu'un de leurs tours
+    for _ in xrange(nb_tours):
+        garder(mesurer_donne, jeu, nb_operations)
+        garder(mesurer_partie, jeu, nb_operations // 4 or 1)
+        # la belote : enchères, plis selon les règles, parties de plusieurs donnes
+        garder(mesurer_donne, belote, nb_operations, 'belote.')
+        garder(mesurer_partie, belote, nb_operations // 20 or 1, 'belote.')
+        garder(mesurer_observable, nb_operations * 50)
+    # la vue en dernier car elle change l'affichage des classes du modèle
+    for _ in xrange(nb_tours):
+        garder(mesurer_console, jeu, nb_operations)
+    etalon = min(etalons)
+    mesures = dict((nom, mediane(valeurs) * etalon) for nom, valeurs in relatives.iteritems())
+    mesures[ETALON] = etalon
+    return mesures
+
+def comparer(mesures, reference, tolerance):
+    """
+    retourne la liste des régressions : (nom, mesure, référence), la référence
+    étant ramenée à la vitesse de la machine des mesures
+    """
+    facteur = mesures[ETALON] / reference[ETALON] \
+              if ETALON in mesures and ETALON in reference else 1.0
+    regressions = []
+    for nom, valeur in sorted(mesures.iteritems()):
+        if nom != ETALON and nom in reference and valeur > reference[nom] * facteur * (1 + tolerance):
+            regressions.append((nom, valeur, reference[nom] * facteur))
+    return regressions
+
+
+if __name__=='__main__':
+    import argparse
+    parseur = argparse.ArgumentParser(description = "banc d'essai du jeu")
+    parseur.add_argument('--sortie', default = 'banc.json')
+    parseur.add_argument('--reference', default = None)
+    parseur.add_argument('--tolerance', type = float, default = 0.25)
+    parseur.add_argument('--operations', type = int, default = 200)
+    parseur.add_argument('--tours', type = int, default = 5)
+    arguments = parseur.parse_args()
+
+    mesures = mesurer(arguments.operations, arguments.tours)
+    for nom, valeur in sorted(mesures.iteritems()):
+        print "{:<28} {:>12.2f} µs".format(nom, valeur * 1e6)
+    with open(arguments.sortie, 'w') as fichier:
+        json.dump(mesures, fichier, indent = 2, sort_keys = True)
+
+    if arguments.reference:
+        with open(arguments.reference) as fichier:
+            reference = json.load(fichier)
+        regressions = comparer(mesures, reference, arguments.tolerance)
+        for nom, valeur, avant in regressions:
+            print "REGRESSION {} : {:.2f} µs au lieu de {:.2f} µs".format(
+                nom, valeur * 1e6, avant * 1e6)
+        if regressions:
+            sys.exit(1)
+        print "aucune régression au-delà de {:.0%}".format(arguments.tolerance)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Jeu de la belote, dérivé du jeu de cartes générique
+Il respecte l'interface de la classe Jeu (voir jeu.py).
+Les joueurs sont associés en 2 équipes : les places paires et les places impaires.
+Chaque joueur reçoit d'abord 5 cartes ; à son tour il peut alors prendre en
+annonçant un contrat (valeur et atout) supérieur au précédent ; les joueurs
+simulés s'appuient sur l'index de la force des mains (voir encheres.py).
+Les 3 dernières cartes de chacun sont distribuées après les enchères.
+Des mains fixées à l'avance sont d'abord mélangées avec le générateur de la
+donne : les 5 cartes des enchères sont tirées au hasard dans chaque main.
+Si personne ne prend, la donne ne rapporte rien.
+Chaque donne se joue à l'atout ; le gagnant d'un pli entame le suivant.
+Le compte des points suit la belote classique :
+- valeur des cartes à l'atout et hors atout,
+- 10 de der pour le dernier pli,
+- belote et rebelote (roi et dame d'atout dans une même main),
+- capot pour l'équipe qui fait tous les plis.
+L'équipe qui a pris doit faire au moins la valeur de son contrat,
+sinon elle est dedans : l'autre équipe marque les 162 points.
+Chaque joueur reçoit les points de son équipe.
+
+Les cartes qu'un joueur peut jouer suivent les règles de la belote :
+fournir à la couleur demandée, sinon couper, sauf si le partenaire est maître,
+monter à l'atout quand c'est possible.
+
+Les règles sont calculées par des tables précalculées indexées par
+(atout, rang de la carte) : le rang est la position d'une carte dans le paquet
+de 32 cartes (voir jeu.paquet), soit couleur * 8 + position de sa valeur.
+Un ensemble de cartes est un masque de bits, le bit d'une carte étant 1 << rang.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from jeu import Jeu
+from modele import JoueurInteractif
+from support import regrouper
+from encheres import index_commun
+from collections import namedtuple
+import journal
+import random
+
+import logging
+logger = logging.getLogger("belote")
+
+# valeurs des cartes dans l'ordre du paquet : as, 7, 8, 9, 10, valet, dame, roi
+VALEURS = (1, 7, 8, 9, 10, 11, 12, 13)
+NB_COULEURS = 4
+NB_VALEURS = len(VALEURS)
+NB_CARTES = NB_COULEURS * NB_VALEURS
+
+# points et ordre de force des valeurs, à l'atout et hors atout
+POINTS_ATOUT = (11, 0, 0, 14, 10, 20, 3, 4)
+POINTS_COULEUR = (11, 0, 0, 0, 10, 2, 3, 4)
+ORDRE_ATOUT = (5, 0, 1, 6, 4, 7, 2, 3)
+ORDRE_COULEUR = (7, 0, 1, 2, 6, 3, 4, 5)
+
+DIX_DE_DER = 10
+BELOTE = 20
+CAPOT = 252
+# total des points d'une donne, 10 de der compris
+TOTAL = 162
+
+# plus petit et plus grand contrat, de 10 en 10
+CONTRAT_MIN = 80
+CONTRAT_MAX = 160
+# cartes de chaque joueur distribuées avant les enchères, les autres après
+NB_CARTES_ENCHERES = 5
+
+# un contrat : la place du preneur, l'atout et la valeur annoncée
+Contrat = namedtuple('Contrat', ('preneur', 'atout', 'valeur'))
+
+def couleur(rang):
+    return rang // NB_VALEURS
+
+def position(rang):
+    return rang % NB_VALEURS
+
+# POINTS[atout][rang] : points d'une carte
+POINTS = tuple(
+    tuple(POINTS_ATOUT[position(rang)] if couleur(rang) == atout else POINTS_COULEUR[position(rang)]
+          for rang in range(NB_CARTES))
+    for atout in range(NB_COULEURS))
+
+# FORCE[atout][rang] : force d'une carte, tout atout est plus fort que toute autre carte
+FORCE = tuple(
+    tuple(NB_VALEURS + ORDRE_ATOUT[position(rang)] if couleur(rang) == atout
+          else ORDRE_COULEUR[position(rang)]
+          for rang in range(NB_CARTES))
+    for atout in range(NB_COULEURS))
+
+# FORCE_PLI[atout][demandee][rang] : force d'une carte dans un pli entamé à la
+# couleur demandée, -1 pour une défausse qui ne peut pas gagner le pli
+FORCE_PLI = tuple(
+    tuple(
+        tuple(FORCE[atout][rang] if couleur(rang) in (atout, demandee) else -1
+              for rang in range(NB_CARTES))
+        for demandee in range(NB_COULEURS))
+    for atout in range(NB_COULEURS))
+
+# MASQUE_BELOTE[atout] : bits de la dame et du roi d'atout
+MASQUE_BELOTE = tuple((1 << (atout * NB_VALEURS + VALEURS.index(12))) |
+                      (1 << (atout * NB_VALEURS + VALEURS.index(13)))
+                      for atout in range(NB_COULEURS))
+
+
+# MASQUE_COULEUR[couleur] : bits des cartes d'une couleur
+MASQUE_COULEUR = tuple(((1 << NB_VALEURS) - 1) << (une * NB_VALEURS)
+                       for une in range(NB_COULEURS))
+
+# PLUS_FORTS[atout][rang] : bits des atouts plus forts que la carte,
+# tous les atouts pour une carte qui n'est pas de l'atout
+PLUS_FORTS = tuple(
+    tuple(sum(1 << autre for autre in range(NB_CARTES)
+              if couleur(autre) == atout and FORCE[atout][autre] > FORCE[atout][rang])
+          for rang in range(NB_CARTES))
+    for atout in range(NB_COULEURS))
+
+
+def gagnant(rangs, atout):
+    """ retourne l'indice de la carte qui gagne le pli, entamé par rangs[0] """
+    forces = FORCE_PLI[atout][rangs[0] // NB_VALEURS]
+    meilleur = 0
+    for indice in range(1, len(rangs)):
+        if forces[rangs[indice]] > forces[rangs[meilleur]]:
+            meilleur = indice
+    return meilleur
+
+def valeur(rangs, atout):
+    """ retourne les points des cartes d'un pli """
+    points = POINTS[atout]
+    return sum(points[rang] for rang in rangs)
+
+def cartes_jouables(main, rangs, atout):
+    """
+    retourne le masque des cartes de la main (un masque) qui peuvent être
+    jouées sur le pli en cours (les rangs des cartes déjà posées)
+    """
+    if not rangs:
+        return main
+    atouts = main & MASQUE_COULEUR[atout]
+    demandee = rangs[0] // NB_VALEURS
+    indice = gagnant(rangs, atout)
+    if demandee == atout:
+        # monter à l'atout si possible, sinon fournir de l'atout
+        if atouts:
+            return atouts & PLUS_FORTS[atout][rangs[indice]] or atouts
+        return main
+    fournir = main & MASQUE_COULEUR[demandee]
+    if fournir:
+        return fournir
+    # le partenaire a posé l'avant-dernière carte : s'il est maître, tout est permis
+    if indice == len(rangs) - 2:
+        return main
+    if atouts:
+        # couper, en montant sur un atout déjà posé si possible
+        return atouts & PLUS_FORTS[atout][rangs[indice]] or atouts
+    return main
+
+def tirer(masque, hasard):
+    """ retourne le rang d'une carte tirée au hasard dans un masque non vide """
+    rangs = []
+    while masque:
+        bit = masque & -masque
+        rangs.append(bit.bit_length() - 1)
+        masque ^= bit
+    return rangs[hasard.randrange(len(rangs))]
+
+def donner(une_donne, debut, fin):
+    """ donne à chaque joueur ses cartes de numéros debut à fin dans sa main complète """
+    if une_donne.mains is not None:
+        # mains fixées à l'avance : rangs des cartes de chaque joueur
+        cartes = une_donne.jeu.cartes
+        for joueur, main in zip(une_donne.joueurs, une_donne.mains):
+            joueur.recevoir([cartes[rang] for rang in main[debut:fin]])
+        return
+    with regrouper(*une_donne.joueurs):
+        for _ in range(debut, fin):
+            for joueur in une_donne.joueurs:
+                joueur.recevoir(une_donne.pioche.pop())
+
+def finir_au_hasard(mains, rangs, premier, atout, hasard):
+    """
+    joue la fin d'une donne au hasard, dans le respect des règles
+    mains : masques des 4 mains (modifiés), rangs : le pli en cours,
+    premier : la place qui a entamé le pli en cours
+    retourne les points gagnés par chaque équipe à partir du pli en cours,
+    10 de der compris, sans belote ni capot
+    """
+    equipes = [0, 0]
+    rangs = list(rangs)
+    while True:
+        while len(rangs) < 4:
+            siege = (premier + len(rangs)) % 4
+            rang = tirer(cartes_jouables(mains[siege], rangs, atout), hasard)
+            mains[siege] &= ~(1 << rang)
+            rangs.append(rang)
+        premier = (premier + gagnant(rangs, atout)) % 4
+        equipes[premier % 2] += valeur(rangs, atout)
+        if not mains[premier]:
+            equipes[premier % 2] += DIX_DE_DER
+            return equipes
+        rangs = []
+
+
+class Belote(Jeu):
+    """ Jeu de la belote à 4 joueurs en 2 équipes """
+    def __init__(self, nom = "Belote", nb_max_points = 1000, nb_max_donnes = 0, index = None):
+        Jeu.__init__(self, nom, NB_CARTES, nb_max_points, nb_max_donnes)
+        # l'étape commune avec le jeu générique
+        battre = self.plan_donne[0]
+        nb_plis = NB_CARTES // 4
+        # la force des mains pour les enchères des joueurs simulés
+        self.index = index if index is not None else index_commun
+
+        def distribuer(une_donne):
+            """ distribue les premières cartes de chaque joueur, avant les enchères """
+            if une_donne.mains is not None:
+                # des mains fixées sont souvent triées (voir classement.py) : mélangées,
+                # les cartes des enchères ne sont pas les plus basses de chaque main
+                hasard = une_donne.hasard if une_donne.hasard is not None else random
+                mains = [[int(rang) for rang in main] for main in une_donne.mains]
+                for main in mains:
+                    hasard.shuffle(main)
+                une_donne.mains = mains
+            donner(une_donne, 0, NB_CARTES_ENCHERES)
+
+        def encherir(une_donne):
+            """ un tour d'enchères, le dernier contrat annoncé est retenu """
+            joueurs = une_donne.joueurs
+            # la main tourne à chaque donne : ce joueur parle et entame le premier pli
+            une_donne.premier = une_donne.numero % len(joueurs)
+            une_donne.contrat = None
+            for indice in range(len(joueurs)):
+                siege = (une_donne.premier + indice) % len(joueurs)
+                minimum = une_donne.contrat.valeur + 10 if une_donne.contrat else CONTRAT_MIN
+                if minimum > CONTRAT_MAX:
+                    break
+                contrat = self.annoncer(joueurs[siege], siege, minimum)
+                if contrat is not None:
+                    une_donne.contrat = contrat
+                    if journal.detaille(logger):
+                        logger.info("%s prend à %s pour %s", joueurs[siege].nom,
+                                    contrat.atout, contrat.valeur)
+            if une_donne.contrat is None:
+                if journal.detaille(logger):
+                    logger.info("Donne passée")
+                une_donne.atout = None
+                return
+            une_donne.atout = une_donne.contrat.atout
+            # l'atout est visible sur le tapis, pour les règles et les joueurs
+            une_donne.tapis.atout = une_donne.atout
+            # comme les places des joueurs et les plis joués
+            une_donne.tapis.joueurs = une_donne.joueurs
+            une_donne.tapis.plis = une_donne.plis
+
+        def completer(une_donne):
+            """ distribue les dernières cartes de chaque joueur, même si la donne est passée """
+            donner(une_donne, NB_CARTES_ENCHERES, nb_plis)
+            une_donne.mains_initiales = [joueur.main.masque for joueur in une_donne.joueurs]
+
+        def jouer(une_donne):
+            """ joue les plis, le gagnant d'un pli entame le suivant """
+            joueurs = une_donne.joueurs
+            tapis = une_donne.tapis
+            if not une_donne.plis:
+                # sinon donne restaurée en cours de jeu : ses plis sont gardés
+                une_donne.gagnants = []
+            if une_donne.contrat is None:
+                # donne passée, les cartes sont rendues
+                for joueur in joueurs:
+                    joueur.main.vider()
+                return
+            premier = une_donne.gagnants[-1] if une_donne.gagnants else une_donne.premier
+            while len(une_donne.plis) < nb_plis:
+                # un pli commencé reprend au joueur suivant
+                for indice in range(len(tapis), len(joueurs)):
+                    joueurs[(premier + indice) % len(joueurs)].jouer(tapis, une_donne.jeu)
+                # pour compter les poins à la fin, copie nécessaire
+                pli = [coup for coup in tapis]
+                une_donne.plis.append(pli)
+                premier = (premier + gagnant([carte.rang for _, carte in pli],
+                                             une_donne.atout)) % len(joueurs)
+                une_donne.gagnants.append(premier)
+                # vider le tapis existant et non le réinitialiser vide
+                del tapis[0:]
+                # pour surveiller le tapis, signale un changement
+                tapis.change('pli')
+
+        def compter(une_donne):
+            """ compte les points de chaque équipe """
+            equipes = compter_equipes(une_donne)
+            for siege, joueur in enumerate(une_donne.joueurs):
+                une_donne.scores[joueur] = equipes[siege % 2]
+
+        # definition du processus de déroulement d'un donne
+        self.plan_donne = (battre, distribuer, encherir, completer, jouer, compter)
+
+    def annoncer(self, joueur, siege, minimum):
+        """ retourne le contrat annoncé par le joueur, au moins minimum, ou None """
+        if isinstance(joueur, JoueurInteractif):
+            # le joueur choisit de passer ou l'atout du contrat minimum
+            options = ['passe'] + [Contrat(siege, atout, minimum) for atout in range(NB_COULEURS)]
+            choix = options[joueur.choisir(options)]
+            return None if choix == 'passe' else choix
+        estimation, atout = self.index.meilleur_atout(joueur.main.masque)
+        # annonce de la plus grande dizaine que la main est censée faire
+        valeur = min(estimation // 10 * 10, CONTRAT_MAX)
+        return Contrat(siege, atout, valeur) if valeur >= minimum else None
+
+    def options(self, joueur, tapis):
+        """ retourne les cartes que le joueur peut jouer sur le tapis """
+        main = joueur.main
+        jouables = cartes_jouables(main.masque, [carte.rang for _, carte in tapis], tapis.atout)
+        if jouables == main.masque:
+            return main
+        return [carte for carte in main if carte.bit & jouables]
+
+def compter_equipes(une_donne):
+    """ retourne les points des 2 équipes d'une donne jouée """
+    atout = une_donne.atout
+    equipes = [0, 0]
+    if une_donne.contrat is None:
+        return equipes
+    plis_gagnes = [0, 0]
+    for pli, siege in zip(une_donne.plis, une_donne.gagnants):
+        equipes[siege % 2] += valeur([carte.rang for _, carte in pli], atout)
+        plis_gagnes[siege % 2] += 1
+    equipes[une_donne.gagnants[-1] % 2] += DIX_DE_DER
+    for equipe in (0, 1):
+        if plis_gagnes[equipe] == len(une_donne.plis):
+            equipes[equipe] = CAPOT
+            equipes[1 - equipe] = 0
+    belotes = [0, 0]
+    for siege, masque in enumerate(une_donne.mains_initiales):
+        if masque & MASQUE_BELOTE[atout] == MASQUE_BELOTE[atout]:
+            belotes[siege % 2] += BELOTE
+    preneurs = une_donne.contrat.preneur % 2
+    if equipes[preneurs] + belotes[preneurs] < une_donne.contrat.valeur:
+        # contrat chuté : la défense marque tout
+        equipes[1 - preneurs] = max(TOTAL, equipes[1 - preneurs])
+        equipes[preneurs] = 0
+    return [equipes[0] + belotes[0], equipes[1] + belotes[1]]
+
+
+if __name__=='__main__':
+    from modele import Table, Joueur
+    print "tests de la belote"
+    # pli entamé à carreau (0), atout pique (1) : le 7 de pique coupe
+    print "gagnant = ", gagnant([0, 4, 9, 5], 1)
+    # atout carreau : pli entamé au roi de pique, le partenaire n'est pas maître
+    # avec [As de pique, 9 de carreau, 7 de coeur] il faut fournir l'as
+    print "jouables = ", cartes_jouables((1 << 8) | (1 << 3) | (1 << 17), [15, 8, 4], 0) == 1 << 8
+    print "total des points = ", sum(valeur(range(une * 8, une * 8 + 8), 1)
+                                     for une in range(NB_COULEURS)) + DIX_DE_DER
+
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    une_belote = Belote()
+    une_table.dedier(une_belote, 1)
+    une_table.jouer()
+    for numero, partiel in enumerate(une_table.feuille_de_points.partiels):
+        print "donne", numero, [partiel[joueur] for joueur in une_table.joueurs]
+    print "champions = ", [joueur.nom for joueur in une_table.feuille_de_points.champions]
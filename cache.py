@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Mémoire des décisions des joueurs simulés
+Un joueur qui réfléchit longtemps (voir ia.py) retrouve souvent les mêmes
+positions, surtout en fin de donne. Sa décision y est mémorisée, indexée par
+une forme canonique de la position : sa main, les cartes déjà jouées, le
+pli en cours, l'atout et sa place ; les couleurs hors atout sont mises dans
+un ordre canonique (voir symetrie.py), la carte choisie aussi.
+Les décisions récentes sont gardées en mémoire, les moins récemment
+utilisées en sortant les premières ; elles peuvent aussi s'écrire dans une
+base sqlite, partagée entre les parties, les processus et les exécutions.
+Chaque écriture est validée aussitôt et la base tenue en mode WAL : les
+lectures ne sont jamais bloquées et les écritures ne le sont qu'un instant.
+Une base restée verrouillée par un autre processus ne fait pas échouer la
+partie : la décision est calculée comme si elle était absente.
+Des compteurs donnent les décisions retrouvées et celles à calculer.
+
+Utilisation :
+    class JoueurMonteCarloMemoire(JoueurEnCache, JoueurMonteCarlo): pass
+    cache = CacheDecisions(fichier = 'decisions.db')
+    joueur = JoueurMonteCarloMemoire("un", cache = cache)
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import sqlite3
+from collections import OrderedDict
+
+from modele import Carte
+from symetrie import canonique, permuter_rang, restituer
+
+import logging
+logger = logging.getLogger("cache")
+
+# seules les positions avec au plus ce nombre de cartes en main sont gardées :
+# les autres ne se répètent presque jamais
+NB_CARTES_MAX = 4
+# attente maximale d'une base verrouillée par un autre processus, en secondes
+DELAI = 1.0
+
+
+def cle_position(main, joues, rangs, atout, siege):
+    """
+    retourne (clé, permutation) d'une position : masques de la main et des cartes
+    jouées avant le pli en cours, rangs du pli en cours, atout et place du joueur
+    """
+    masques, permutation = canonique([main, joues] + [1 << rang for rang in rangs], atout)
+    cle = masques[0] | masques[1] << 32
+    for indice, rang in enumerate(rangs):
+        cle |= (permuter_rang(rang, permutation) + 1) << (64 + 6 * indice)
+    cle |= atout << 82 | siege << 84
+    return cle, permutation
+
+
+class CacheDecisions(object):
+    """ Décisions par position, en mémoire (LRU) et au besoin sur disque (sqlite) """
+    def __init__(self, taille_max = 100000, fichier = None):
+        self.taille_max = taille_max
+        self.decisions = OrderedDict()
+        self.base = None
+        if fichier:
+            # une base partagée : attendre un peu qu'un autre processus ait fini d'écrire
+            self.base = sqlite3.connect(fichier, timeout = DELAI)
+            self.base.execute("PRAGMA journal_mode = WAL")
+            self.base.execute("PRAGMA synchronous = NORMAL")
+            with self.base:
+                self.base.execute("CREATE TABLE IF NOT EXISTS decisions "
+                                  "(cle TEXT PRIMARY KEY, rang INTEGER)")
+        # compteurs des décisions retrouvées en mémoire, sur disque, et à calculer
+        self.trouvees = 0
+        self.trouvees_disque = 0
+        self.manquees = 0
+        # accès à la base manqués parce qu'elle était verrouillée
+        self.erreurs = 0
+
+    def lire(self, cle):
+        """ retourne la décision (un rang de carte) mémorisée pour la clé, ou None """
+        decisions = self.decisions
+        rang = decisions.pop(cle, None)
+        if rang is not None:
+            # remise en dernière place : la plus récemment utilisée
+            decisions[cle] = rang
+            self.trouvees = self.trouvees + 1
+            return rang
+        if self.base is not None:
+            try:
+                ligne = self.base.execute("SELECT rang FROM decisions WHERE cle = ?",
+                                          (str(cle),)).fetchone()
+            except sqlite3.OperationalError:
+                # base verrouillée : la décision sera calculée
+                self.erreurs = self.erreurs + 1
+                ligne = None
+            if ligne is not None:
+                self.trouvees_disque = self.trouvees_disque + 1
+                self.garder(cle, ligne[0])
+                return ligne[0]
+        self.manquees = self.manquees + 1
+        return None
+
+    def garder(self, cle, rang):
+        """ garde une décision en mémoire, à la place de la moins récemment utilisée """
+        decisions = self.decisions
+        if cle in decisions:
+            del decisions[cle]
+        elif len(decisions) >= self.taille_max:
+            decisions.popitem(last = False)
+        decisions[cle] = rang
+
+    def ecrire(self, cle, rang):
+        """ mémorise une décision, en mémoire et dans la base """
+        self.garder(cle, rang)
+        if self.base is not None:
+            try:
+                # une transaction par écriture : la base n'est verrouillée qu'un instant
+                with self.base:
+                    self.base.execute("INSERT OR REPLACE INTO decisions VALUES (?, ?)",
+                                      (str(cle), rang))
+            except sqlite3.OperationalError:
+                # base verrouillée : la décision n'est gardée qu'en mémoire
+                self.erreurs = self.erreurs + 1
+
+    def compteurs(self):
+        """ retourne les compteurs et le taux de décisions retrouvées """
+        total = self.trouvees + self.trouvees_disque + self.manquees
+        return {'trouvees': self.trouvees, 'trouvees_disque': self.trouvees_disque,
+                'manquees': self.manquees, 'erreurs': self.erreurs,
+                'taux': float(self.trouvees + self.trouvees_disque) / total if total else 0.0}
+
+    def fermer(self):
+        """ ferme la base """
+        if self.base is not None:
+            self.base.close()
+            self.base = None
+
+
+class JoueurEnCache(object):
+    """
+    Mémoire des décisions d'un joueur, à placer avant sa classe :
+    class JoueurMemoire(JoueurEnCache, ClasseDuJoueur)
+    """
+    def __init__(self, nom, visible = False, cache = None, **options):
+        super(JoueurEnCache, self).__init__(nom, visible, **options)
+        self.cache = cache
+        self.tapis = None
+
+    def jouer(self, tapis, jeu):
+        self.tapis = tapis
+        super(JoueurEnCache, self).jouer(tapis, jeu)
+
+    def choisir(self, options):
+        """ retrouve la décision mémorisée pour la position, sinon la prend et la mémorise """
+        tapis = self.tapis
+        if self.cache is None or tapis is None or tapis.atout is None or len(options) < 2 \
+           or len(self.main) > NB_CARTES_MAX or not isinstance(options[0], Carte):
+            return super(JoueurEnCache, self).choisir(options)
+        joues = 0
+        for pli in tapis.plis:
+            for _, carte in pli:
+                joues |= carte.bit
+        rangs = [carte.rang for _, carte in tapis]
+        siege = list(tapis.joueurs).index(self)
+        cle, permutation = cle_position(self.main.masque, joues, rangs, tapis.atout, siege)
+        rang = self.cache.lire(cle)
+        if rang is not None:
+            rang = restituer(rang, permutation)
+            for indice, carte in enumerate(options):
+                if carte.rang == rang:
+                    return indice
+        indice = super(JoueurEnCache, self).choisir(options)
+        self.cache.ecrire(cle, permuter_rang(options[indice].rang, permutation))
+        return indice
+
+
+if __name__=='__main__':
+    import os
+    import tempfile
+    import time
+    from modele import Table, Joueur
+    from belote import Belote
+    from ia import JoueurMonteCarlo
+    print "tests de la mémoire des décisions"
+
+    class JoueurMonteCarloMemoire(JoueurEnCache, JoueurMonteCarlo):
+        pass
+
+    fichier = os.path.join(tempfile.mkdtemp(), 'decisions.db')
+    for execution in range(2):
+        cache = CacheDecisions(fichier = fichier)
+        une_table = Table()
+        # un budget en simulations et non en temps, pour que les parties se répètent
+        options = dict(cache = cache, budget_temps = 60, budget_simulations = 50)
+        une_table.accueuillir(JoueurMonteCarloMemoire("un", **options), Joueur("deux"),
+                              JoueurMonteCarloMemoire("trois", **options), Joueur("quatre"))
+        debut = time.time()
+        for graine in range(3):
+            une_table.dedier(Belote(nb_max_points = 0, nb_max_donnes = 5), graine)
+            une_table.jouer()
+        print "exécution {} : 15 donnes en {:.1f} s".format(execution + 1, time.time() - debut), \
+              cache.compteurs()
+        cache.fermer()
+    # un autre processus garde la base verrouillée en écriture : le cache continue sans elle
+    cache = CacheDecisions(taille_max = 1, fichier = fichier)
+    autre = sqlite3.connect(fichier)
+    autre.execute("BEGIN IMMEDIATE")
+    cache.ecrire(1, 2)
+    cache.ecrire(3, 4)
+    print "base verrouillée : décision relue =", cache.lire(1), ",", cache.compteurs()['erreurs'], \
+          "écritures manquées"
+    autre.rollback()
+    autre.close()
+    cache.fermer()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Numérotation des donnes
+Chaque donne distincte d'un paquet reçoit un numéro entre 0 et le nombre de
+donnes distinctes (32! / 8!^4 pour 4 joueurs et 32 cartes) : la donne se
+retrouve à partir de son numéro et inversement, sans hasard ni table.
+Les machines d'une étude peuvent ainsi se partager des tranches de numéros
+sans se coordonner ni jouer 2 fois la même donne.
+
+Le numéro d'une donne s'écrit en base mixte : la main du premier joueur est
+numérotée parmi toutes les combinaisons de cartes du paquet, celle du
+suivant parmi les cartes restantes, etc. ; la dernière main est le reste.
+Une combinaison est numérotée par le système combinatoire :
+les positions c1 < c2 < ... < ck donnent le numéro C(c1, 1) + ... + C(ck, k).
+Les mains sont des rangs de cartes du paquet (voir jeu.paquet),
+elles se passent directement à une Donne qui n'a plus à battre ni distribuer.
+
+Utilisation :
+    debut, fin = tranche(numero_machine, nb_machines)
+    for numero in xrange(debut, fin): ... une_donne = donne(numero, ...) ...
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from jeu import Donne
+
+NB_MAX_CARTES = 54
+# BINOMES[n][k] : nombre de combinaisons de k éléments parmi n
+BINOMES = [[1]]
+for _n in range(1, NB_MAX_CARTES + 1):
+    BINOMES.append([1] + [BINOMES[_n - 1][_k - 1] + (BINOMES[_n - 1][_k] if _k < _n else 0)
+                          for _k in range(1, _n + 1)])
+
+
+def binome(n, k):
+    return BINOMES[n][k] if 0 <= k <= n else 0
+
+def nb_donnes(nb_cartes = 32, nb_joueurs = 4):
+    """ retourne le nombre de donnes distinctes """
+    taille = nb_cartes // nb_joueurs
+    nombre = 1
+    for joueur in range(nb_joueurs - 1):
+        nombre = nombre * binome(nb_cartes - joueur * taille, taille)
+    return nombre
+
+def classer_combinaison(positions):
+    """ retourne le numéro d'une combinaison de positions croissantes """
+    return sum(binome(position, indice + 1) for indice, position in enumerate(positions))
+
+def combinaison(numero, taille, nb_positions):
+    """ retourne les positions croissantes de la combinaison de numéro donné """
+    positions = [0] * taille
+    position = nb_positions - 1
+    for indice in range(taille, 0, -1):
+        # la plus grande position dont le binôme tient dans le numéro
+        while binome(position, indice) > numero:
+            position = position - 1
+        positions[indice - 1] = position
+        numero = numero - binome(position, indice)
+        position = position - 1
+    return positions
+
+def classer(mains, nb_cartes = 32):
+    """ retourne le numéro d'une donne : les rangs des cartes de chaque main """
+    restantes = range(nb_cartes)
+    numero = 0
+    for main in mains[:-1]:
+        base = binome(len(restantes), len(main))
+        rangs = set(main)
+        positions = [position for position, rang in enumerate(restantes) if rang in rangs]
+        numero = numero * base + classer_combinaison(positions)
+        restantes = [rang for rang in restantes if rang not in rangs]
+    return numero
+
+def declasser(numero, nb_cartes = 32, nb_joueurs = 4):
+    """ retourne les mains (rangs des cartes par joueur) de la donne de numéro donné """
+    if not 0 <= numero < nb_donnes(nb_cartes, nb_joueurs):
+        raise ValueError("pas de donne de numéro {}".format(numero))
+    taille = nb_cartes // nb_joueurs
+    # les chiffres du numéro, du dernier joueur au premier
+    chiffres = []
+    for joueur in range(nb_joueurs - 2, -1, -1):
+        numero, chiffre = divmod(numero, binome(nb_cartes - joueur * taille, taille))
+        chiffres.append(chiffre)
+    chiffres.reverse()
+    restantes = range(nb_cartes)
+    mains = []
+    for chiffre in chiffres:
+        positions = combinaison(chiffre, taille, len(restantes))
+        mains.append([restantes[position] for position in positions])
+        for position in reversed(positions):
+            del restantes[position]
+    mains.append(restantes)
+    return mains
+
+def tranche(numero_machine, nb_machines, nb_cartes = 32, nb_joueurs = 4):
+    """ retourne (début, fin) des numéros de donnes d'une machine parmi nb_machines """
+    total = nb_donnes(nb_cartes, nb_joueurs)
+    return total * numero_machine // nb_machines, total * (numero_machine + 1) // nb_machines
+
+def donne(numero, jeu, joueurs, tapis, pioche, hasard = None):
+    """ retourne la donne de numéro donné, prête à être déroulée """
+    return Donne(jeu, joueurs, tapis, pioche, hasard,
+                 declasser(numero, jeu.nb_cartes, len(joueurs)))
+
+
+if __name__=='__main__':
+    import random
+    import time
+    from modele import Table, Joueur
+    from jeu import Jeu
+    print "tests de la numérotation des donnes"
+    print nb_donnes(), "donnes de belote distinctes"
+    hasard = random.Random(5)
+    debut = time.time()
+    for essai in range(10000):
+        numero = hasard.randrange(nb_donnes())
+        mains = declasser(numero)
+        assert sorted(sum(mains, [])) == range(32)
+        assert classer(mains) == numero
+    print "10000 donnes numérotées aller et retour en {:.2f} s".format(time.time() - debut)
+    # petit paquet : toutes les donnes sont distinctes
+    toutes = set(tuple(map(tuple, declasser(numero, 8, 4))) for numero in range(nb_donnes(8, 4)))
+    print len(toutes), "donnes distinctes de 8 cartes sur", nb_donnes(8, 4)
+    print "tranches de 3 machines = ", [tranche(machine, 3) for machine in range(3)]
+
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    une_donne = donne(12345, Jeu(), une_table.joueurs, une_table.tapis, une_table.pioche)
+    une_donne.derouler()
+    print "plis de la donne 12345 = ", [[carte.rang for _, carte in pli] for pli in une_donne.plis][:2]
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Historique des plis en colonnes, pour les analyses à grande échelle
+Chaque carte jouée est une ligne ; chaque information est une colonne,
+un tableau numpy : partie, donne, pli, ordre dans le pli, place du joueur,
+carte (son rang), atout, preneur, gagnant du pli et points de la carte
+(sans le 10 de der) : les points d'un pli sont la somme de ses 4 lignes.
+Une valeur inconnue (donne sans atout, jeu sans gagnant) vaut 255.
+Les questions se posent sur des colonnes entières, sans reparcourir les
+objets du jeu : filtrer les lignes, les compter ou sommer une colonne,
+au besoin groupées selon d'autres colonnes.
+
+Les colonnes s'ajoutent aux enregistreurs d'une partie, à côté d'un
+archiveur au besoin (voir archive.py) : elles reçoivent chaque donne finie
+puis la partie terminée.
+Ce module dépend de numpy.
+
+Utilisation :
+    colonnes = Colonnes()
+    une_table.partie.enregistreurs.append(colonnes)
+    ...
+    # plis où le valet d'atout est joué, par numéro de pli
+    colonnes.compter(('pli',), colonnes['carte'] == colonnes['atout'] * 8 + 5)
+    # points ramassés par place
+    colonnes.sommer('points', ('gagnant',))
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import numpy as np
+
+from belote import POINTS
+
+AUCUN = 255
+# nom et type de chaque colonne
+COLONNES = (('partie', np.uint32), ('donne', np.uint16), ('pli', np.uint8),
+            ('ordre', np.uint8), ('siege', np.uint8), ('carte', np.uint8),
+            ('atout', np.uint8), ('preneur', np.uint8), ('gagnant', np.uint8),
+            ('points', np.uint8))
+
+
+class Colonnes(object):
+    """ Les cartes jouées, une ligne par carte, rangées par colonne """
+    def __init__(self, capacite = 1 << 16):
+        self.capacite = capacite
+        self.tableaux = dict((nom, np.zeros(capacite, genre)) for nom, genre in COLONNES)
+        self.taille = 0
+        # numéros de la partie et de la donne en cours
+        self.partie = 0
+        self.donne = 0
+
+    def __len__(self):
+        return self.taille
+
+    def __getitem__(self, nom):
+        """ retourne une colonne, limitée aux lignes remplies """
+        return self.tableaux[nom][:self.taille]
+
+    def agrandir(self, taille):
+        """ double la capacité des colonnes jusqu'à pouvoir contenir taille lignes """
+        capacite = self.capacite
+        while capacite < taille:
+            capacite = capacite * 2
+        if capacite != self.capacite:
+            for nom, tableau in self.tableaux.items():
+                nouveau = np.zeros(capacite, tableau.dtype)
+                nouveau[:self.taille] = tableau[:self.taille]
+                self.tableaux[nom] = nouveau
+            self.capacite = capacite
+
+    def ajouter(self, nombre, **valeurs):
+        """ ajoute nombre lignes : une valeur ou une suite de valeurs par colonne """
+        fin = self.taille + nombre
+        self.agrandir(fin)
+        for nom, _ in COLONNES:
+            self.tableaux[nom][self.taille:fin] = valeurs[nom]
+        self.taille = fin
+
+    def noter_donne(self, une_donne):
+        """ ajoute les cartes jouées d'une donne finie de la partie en cours """
+        places = dict((joueur, siege) for siege, joueur in enumerate(une_donne.joueurs))
+        atout = getattr(une_donne, 'atout', None)
+        contrat = getattr(une_donne, 'contrat', None)
+        gagnants = getattr(une_donne, 'gagnants', None) or ()
+        lignes = dict((nom, []) for nom in ('pli', 'ordre', 'siege', 'carte', 'gagnant', 'points'))
+        points = POINTS[atout] if atout is not None else None
+        for numero, pli in enumerate(une_donne.plis):
+            gagnant = gagnants[numero] if numero < len(gagnants) else AUCUN
+            for ordre, (joueur, carte) in enumerate(pli):
+                lignes['pli'].append(numero)
+                lignes['ordre'].append(ordre)
+                lignes['siege'].append(places[joueur])
+                lignes['carte'].append(carte.rang)
+                lignes['gagnant'].append(gagnant)
+                lignes['points'].append(points[carte.rang] if points is not None else 0)
+        if lignes['carte']:
+            self.ajouter(len(lignes['carte']), partie = self.partie, donne = self.donne,
+                         atout = AUCUN if atout is None else atout,
+                         preneur = AUCUN if contrat is None else contrat.preneur, **lignes)
+        self.donne = self.donne + 1
+
+    def ecrire(self, une_partie):
+        """ passe à la partie suivante """
+        self.partie = self.partie + 1
+        self.donne = 0
+
+    def filtrer(self, **conditions):
+        """
+        retourne le masque des lignes où chaque colonne nommée vaut la valeur
+        donnée, ou l'une des valeurs d'une liste
+        """
+        masque = np.ones(self.taille, bool)
+        for nom, attendu in conditions.iteritems():
+            colonne = self[nom]
+            if isinstance(attendu, (list, tuple, set)):
+                masque &= np.in1d(colonne, list(attendu))
+            else:
+                masque &= colonne == attendu
+        return masque
+
+    def grouper(self, par, masque = None):
+        """
+        retourne (groupes, indices) des lignes sélectionnées par le masque :
+        les valeurs distinctes des colonnes par, et pour chaque ligne son groupe
+        """
+        colonnes = [self[nom] if masque is None else self[nom][masque] for nom in par]
+        # les colonnes réunies en un seul entier par ligne
+        cles = np.zeros(len(colonnes[0]), np.int64)
+        etendue = 1
+        for colonne in colonnes:
+            base = int(colonne.max()) + 1 if len(colonne) else 1
+            etendue = etendue * base
+            if etendue >= 1 << 63:
+                raise ValueError("trop de groupes possibles pour {}".format(par))
+            cles = cles * base + colonne
+        _, premieres, indices = np.unique(cles, return_index = True, return_inverse = True)
+        groupes = zip(*[colonne[premieres].tolist() for colonne in colonnes])
+        return groupes, indices
+
+    def compter(self, par = (), masque = None):
+        """ retourne le nombre de lignes sélectionnées, par groupe des colonnes par """
+        if not par:
+            return int(masque.sum()) if masque is not None else self.taille
+        groupes, indices = self.grouper(par, masque)
+        return dict(zip(groupes, np.bincount(indices).tolist()))
+
+    def sommer(self, nom, par = (), masque = None):
+        """ retourne la somme d'une colonne sur les lignes sélectionnées, par groupe """
+        colonne = self[nom] if masque is None else self[nom][masque]
+        if not par:
+            return int(colonne.sum(dtype = np.int64))
+        groupes, indices = self.grouper(par, masque)
+        # les colonnes sont entières, les sommes aussi
+        sommes = np.bincount(indices, weights = colonne).astype(np.int64)
+        return dict(zip(groupes, sommes.tolist()))
+
+    def enregistrer(self, chemin):
+        """ écrit les colonnes remplies dans un fichier numpy (.npz) """
+        np.savez(chemin, compteurs = np.array([self.partie, self.donne], np.int64),
+                 **dict((nom, self[nom]) for nom, _ in COLONNES))
+
+    def charger(self, chemin):
+        """ remplace les colonnes par celles d'un fichier écrit par enregistrer """
+        with np.load(chemin) as fichier:
+            self.taille = 0
+            self.ajouter(len(fichier['carte']),
+                         **dict((nom, fichier[nom]) for nom, _ in COLONNES))
+            self.partie, self.donne = fichier['compteurs'].tolist()
+
+
+if __name__=='__main__':
+    import os
+    import tempfile
+    import time
+    from modele import Table, Joueur
+    from belote import Belote
+    from archive import Archiveur, Lecteur
+    print "tests des colonnes"
+    colonnes = Colonnes()
+    # les mêmes parties archivées à côté, pour vérifier les colonnes
+    chemin = os.path.join(tempfile.mkdtemp(), 'parties.bel')
+    archiveur = Archiveur(chemin)
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    debut = time.time()
+    for graine in range(200):
+        une_table.dedier(Belote(), graine)
+        une_table.partie.enregistreurs.extend([colonnes, archiveur])
+        une_table.jouer()
+    archiveur.fermer()
+    print len(colonnes), "cartes jouées enregistrées en {:.1f} s".format(time.time() - debut)
+    lecteur = Lecteur(chemin)
+    cartes = [rang for partie in lecteur for donne in partie['donnes']
+              for pli in donne['plis'] for _, rang in pli]
+    print "cartes identiques à l'archive = ", cartes == colonnes['carte'].tolist()
+    lecteur.fermer()
+    # sans le 10 de der, une donne jouée compte 152 points
+    par_donne = colonnes.sommer('points', ('partie', 'donne'))
+    print "152 points par donne = ", set(par_donne.values()) == set([152])
+
+    debut = time.time()
+    # une ligne par pli : la première carte
+    plis = colonnes.filtrer(ordre = 0)
+    nb_donnes = colonnes.compter(masque = colonnes.filtrer(ordre = 0, pli = 0))
+    valet = colonnes['carte'] == colonnes['atout'] * 8 + 5
+    print "valet d'atout joué au premier pli : {:.1%} des donnes".format(
+        float(colonnes.compter(masque = valet & colonnes.filtrer(pli = 0))) / nb_donnes)
+    print "plis gagnés par place = ", colonnes.compter(('gagnant',), plis)
+    print "points ramassés par place = ", colonnes.sommer('points', ('gagnant',))
+    print "requêtes en {:.3f} s".format(time.time() - debut)
+
+    chemin = os.path.join(os.path.dirname(chemin), 'plis.npz')
+    colonnes.enregistrer(chemin)
+    relues = Colonnes()
+    relues.charger(chemin)
+    print "relues identiques = ", all((relues[nom] == colonnes[nom]).all() for nom, _ in COLONNES)
@@ -11,15 +11,18 @@ Licence CeCill v2
 novembre 2016
 """
 
-# module logger
+# module logger, configuré au lancement et non à l'import
 import logging
-logging.basicConfig(filename='belote.log',level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+import journal
+# utilisé par la simulation sans vue
+import time
 logger = logging.getLogger("controleur")
 
 # les 2 autres modules sont importés pour être utilisés.
 import modele as m
 import vue as v
-from jeu import Jeu
+from belote import Belote
+from tournoi import graine_partie
 
 
 class Controleur(object):
@@ -27,29 +30,33 @@ class Controleur(object):
     Le controleur crée les objets utilisés
     à partir des classes des modules de la vue et du modèle.
     """
-    def __init__(self, vue = 'C'):
+    def __init__(self, vue = 'C', sortie = None):
         """crée les données du controleur et la vue sur ces données"""
         self.table = m.Table()
         if vue == 'G':
             self.vue = v.Graphique(self.table)
         else:
-            self.vue = v.Console(self.table)
+            self.vue = v.Console(self.table, sortie)
 
-    def personnaliser(self):
-        """met en place les joueurs et le jeu"""
+    def personnaliser(self, joueurs = None, graine = None):
+        """
+        met en place les joueurs et le jeu
+        une graine donne la partie de numéro 0 d'une simulation de même graine
+        """
         logger.info("Démarrage du contrôleur")
 
-        # détermine les joueurs interactifs
-        # pour commencer un seul
-        moi = m.JoueurInteractif("moi", visible = True)
+        if joueurs is None:
+            # détermine les joueurs interactifs
+            # pour commencer un seul
+            moi = m.JoueurInteractif("moi", visible = True)
+            joueurs = [moi, m.Joueur("gauche"), m.Joueur("partenaire"), m.Joueur("droite")]
 
         # installe les joueurs à la table
         # pour commencer par programme
-        self.table.accueuillir(moi, m.Joueur("gauche"), m.Joueur("partenaire"), m.Joueur("droite"))
+        self.table.accueuillir(*joueurs)
 
         # prepare la table pour un jeu de cartes
-        # pour commencer un jeu générique
-        self.table.dedier(Jeu())
+        self.table.dedier(Belote(), graine_partie(graine, 0) if graine is not None else None)
         self.vue.personnaliser(self.table)
         self.vue.afficher()
 
@@ -63,15 +70,77 @@ class Controleur(object):
             else:
                 continue
 
-def animer(table_de_jeu):
+def animer(table_de_jeu, graine = None):
+    # une graine fixée rend la partie reproductible
     table_de_jeu = Controleur()
-    table_de_jeu.personnaliser()
+    table_de_jeu.personnaliser(graine = graine)
     table_de_jeu.activer()
 
+def joueurs_automatiques():
+    """ retourne les joueurs d'une simulation """
+    return [m.Joueur("un"), m.Joueur("deux"), m.Joueur("trois"), m.Joueur("quatre")]
+
+def simuler(nb_parties = 1000, graine = None, classe_jeu = Belote):
+    """
+    enchaine des parties entre joueurs automatiques, sans vue ni observateur
+    et sans journal détaillé de chaque carte.
+    Retourne les points de chaque partie (par nom de joueur)
+    et le nombre de parties jouées par seconde.
+    Chaque partie a son générateur, de graine tirée de graine et de son numéro
+    (voir tournoi.graine_partie) : la partie de numéro 0 est celle que joue le
+    déroulement normal avec la même graine et les mêmes joueurs.
+    """
+    table = m.Table()
+    table.accueuillir(*joueurs_automatiques())
+    resultats = []
+    # le journal est coupé pendant la simulation puis remis dans son état
+    coupure = logging.root.manager.disable
+    logging.disable(max(coupure, logging.INFO))
+    debut = time.time()
+    try:
+        for numero in xrange(nb_parties):
+            table.dedier(classe_jeu(), graine_partie(graine, numero) if graine is not None else None)
+            table.jouer()
+            resultats.append(dict((joueur.nom, points) for joueur, points
+                                  in table.feuille_de_points.iteritems()))
+    finally:
+        logging.disable(coupure)
+    duree = time.time() - debut
+    cadence = nb_parties / duree if duree > 0 else float('inf')
+    logger.info("%d parties simulées en %.3f s (%.1f parties/s)",
+                nb_parties, duree, cadence)
+    return resultats, cadence
+
 if __name__=='__main__':
+    # journal écrit en arrière-plan, sans ralentir le jeu
+    journal.configurer('belote.log')
     # la variable table est globale pour qu'elle soit visible pendant
     # l'execution par le debogueur,
     # elle pourra ainsi faciliter la mise au point
-    logger.info("Lancement Belote")
-    table_de_jeu = None
-    animer(table_de_jeu)
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'simuler':
+        # python controleur.py simuler [nb_parties [graine]]
+        nb_parties = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        graine = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        logger.info("Lancement Belote sans vue")
+        resultats, cadence = simuler(nb_parties, graine)
+        print "{} parties jouées, {:.1f} parties par seconde".format(len(resultats), cadence)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'tests':
+        # python controleur.py tests
+        import StringIO
+        print "tests du contrôleur"
+        # la partie affichée, entre les joueurs d'une simulation, et la simulée
+        for graine in (7, 2016):
+            affichee = Controleur(sortie = StringIO.StringIO())
+            affichee.personnaliser(joueurs_automatiques(), graine)
+            affichee.activer()
+            points = dict((joueur.nom, points) for joueur, points
+                          in affichee.table.feuille_de_points.iteritems())
+            resultats, cadence = simuler(3, graine)
+            print "graine {} : points affichés = simulés : {}, {}".format(
+                graine, points == resultats[0], points)
+        print "parties différentes d'une graine à l'autre = ", resultats[0] != resultats[1]
+    else:
+        logger.info("Lancement Belote")
+        table_de_jeu = None
+        animer(table_de_jeu)
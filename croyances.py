@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ce qu'un joueur de belote sait des cartes qu'il ne voit pas
+Le suivi s'abonne aux coups joués sur le tapis et tient à jour, pour un
+joueur, en un temps constant par carte :
+- le masque des cartes inconnues : ni jouées ni dans sa main,
+- le nombre de cartes restant dans chaque main,
+- pour chaque place, le masque des cartes qu'elle ne peut pas avoir,
+  déduites des règles (voir belote.cartes_jouables) : qui ne fournit pas
+  n'a plus de la couleur demandée, qui ne coupe pas quand il le doit n'a
+  plus d'atout, qui ne monte pas à l'atout n'a pas d'atout plus fort.
+Les questions sur ces masques se posent en temps constant, et des mains
+cachées compatibles avec tout ce qui est su se tirent au hasard (repartir).
+Le suivi se remet à zéro de lui-même à chaque nouvelle donne.
+
+Utilisation :
+    croyances = Croyances(joueur)
+    croyances.suivre(tapis)
+    ... croyances.possibles(siege), croyances.repartir(hasard) ...
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from belote import NB_CARTES, NB_VALEURS, MASQUE_COULEUR, PLUS_FORTS, gagnant
+
+TOUTES = (1 << NB_CARTES) - 1
+# nombre de tirages essayés avant de renoncer aux déductions
+NB_ESSAIS = 100
+
+
+def repartir(siege, main, inconnues, restantes, exclues, hasard, nb_essais = NB_ESSAIS):
+    """
+    retourne les masques de 4 mains compatibles : la main du joueur à sa place,
+    les cartes inconnues ailleurs selon le nombre de cartes restant à chaque
+    place et hors des cartes exclues de chaque place
+    les cartes les plus contraintes sont placées d'abord, chacune dans une
+    place permise tirée en proportion des cartes qui lui manquent
+    """
+    autres = [une for une in range(len(restantes)) if une != siege]
+    cartes = []
+    masque = inconnues
+    while masque:
+        bit = masque & -masque
+        cartes.append((bit, [une for une in autres if not exclues[une] & bit]))
+        masque ^= bit
+    for _ in range(nb_essais):
+        hasard.shuffle(cartes)
+        cartes.sort(key = lambda carte: len(carte[1]))
+        places = list(restantes)
+        mains = [0] * len(restantes)
+        mains[siege] = main
+        for bit, permises in cartes:
+            total = sum(places[une] for une in permises)
+            if not total:
+                break
+            tirage = hasard.randrange(total)
+            for une in permises:
+                tirage = tirage - places[une]
+                if tirage < 0:
+                    break
+            mains[une] |= bit
+            places[une] = places[une] - 1
+        else:
+            return mains
+    # déductions incompatibles (donne incohérente) : seuls les nombres comptent
+    return repartir(siege, main, inconnues, restantes, [0] * len(restantes), hasard, 1) \
+           if any(exclues) else None
+
+
+class Croyances(object):
+    """ Ce qu'un joueur sait des mains des autres, au fil des coups """
+    def __init__(self, joueur):
+        self.joueur = joueur
+        self.tapis = None
+        # les plis de la donne suivie, pour reconnaître une nouvelle donne
+        self.plis = None
+        self.atout = None
+        self.places = {}
+        self.siege = None
+        self.inconnues = 0
+        self.restantes = []
+        self.exclues = []
+
+    def suivre(self, tapis):
+        """ s'abonne aux coups joués sur le tapis """
+        self.abandonner()
+        self.tapis = tapis
+        self.plis = None
+        tapis.subscribe(self.noter, 'coup')
+
+    def abandonner(self):
+        """ se désabonne du tapis suivi """
+        if self.tapis is not None:
+            self.tapis.unsubscribe(self.noter, 'coup')
+            self.tapis = None
+
+    def noter(self, evenement):
+        """ prend en compte un coup joué sur le tapis """
+        tapis = evenement.source
+        if tapis.plis is not self.plis:
+            # nouvelle donne : le coup est pris en compte avec les précédents
+            self.reconstruire(tapis)
+            return
+        rangs = [carte.rang for _, carte in tapis[:-1]]
+        self.jouer(self.places[evenement.joueur], evenement.carte.rang, rangs)
+
+    def actualiser(self, tapis):
+        """ s'assure que le suivi correspond à la donne en cours sur le tapis """
+        if tapis.plis is not self.plis or self.tapis is not tapis:
+            self.reconstruire(tapis)
+
+    def reconstruire(self, tapis):
+        """ repart de la main du joueur et rejoue tous les coups de la donne """
+        self.plis = tapis.plis
+        self.atout = tapis.atout
+        self.places = dict((joueur, siege) for siege, joueur in enumerate(tapis.joueurs))
+        self.siege = self.places[self.joueur]
+        nb_joueurs = len(tapis.joueurs)
+        self.inconnues = TOUTES & ~self.joueur.main.masque
+        self.restantes = [NB_CARTES // nb_joueurs] * nb_joueurs
+        self.exclues = [0] * nb_joueurs
+        for pli in tapis.plis + [tapis]:
+            rangs = []
+            for joueur, carte in pli:
+                self.jouer(self.places[joueur], carte.rang, rangs)
+                rangs.append(carte.rang)
+
+    def jouer(self, siege, rang, rangs):
+        """ prend en compte la carte rang jouée par siege sur le pli rangs """
+        bit = 1 << rang
+        self.inconnues &= ~bit
+        self.restantes[siege] = self.restantes[siege] - 1
+        if not rangs:
+            return
+        atout = self.atout
+        demandee = rangs[0] // NB_VALEURS
+        une = rang // NB_VALEURS
+        indice = gagnant(rangs, atout)
+        # le partenaire est maître : toute carte est permise à qui ne fournit pas
+        libre = demandee != atout and indice == len(rangs) - 2
+        exclues = 0
+        if une != demandee:
+            exclues |= MASQUE_COULEUR[demandee]
+            if une != atout and not libre:
+                # ni fourni ni coupé
+                exclues |= MASQUE_COULEUR[atout]
+        if une == atout and not libre and not bit & PLUS_FORTS[atout][rangs[indice]]:
+            # n'a pas monté à l'atout
+            exclues |= PLUS_FORTS[atout][rangs[indice]]
+        self.exclues[siege] |= exclues
+
+    def possibles(self, siege):
+        """ retourne le masque des cartes que peut avoir le joueur à cette place """
+        if siege == self.siege:
+            return self.joueur.main.masque
+        return self.inconnues & ~self.exclues[siege]
+
+    def est_coupe(self, siege, couleur):
+        """ retourne vrai si le joueur à cette place n'a plus de la couleur """
+        return not self.possibles(siege) & MASQUE_COULEUR[couleur]
+
+    def atouts_dehors(self):
+        """ retourne le masque des atouts que les autres joueurs peuvent encore avoir """
+        return self.inconnues & MASQUE_COULEUR[self.atout] if self.atout is not None else 0
+
+    def repartir(self, hasard):
+        """ retourne les masques de 4 mains compatibles avec ce qui est su """
+        return repartir(self.siege, self.joueur.main.masque, self.inconnues,
+                        self.restantes, self.exclues, hasard)
+
+
+if __name__=='__main__':
+    import random
+    import time
+    from modele import Table, Joueur
+    from belote import Belote
+    print "tests du suivi des cartes"
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    suivis = [Croyances(joueur) for joueur in une_table.joueurs]
+    for suivi in suivis:
+        suivi.suivre(une_table.tapis)
+    # à chaque coup, les vraies mains doivent être compatibles avec les déductions
+    erreurs = [0]
+    def verifier(evenement):
+        for suivi in suivis:
+            for siege, joueur in enumerate(une_table.joueurs):
+                if joueur.main.masque & ~suivi.possibles(siege):
+                    erreurs[0] = erreurs[0] + 1
+    une_table.tapis.subscribe(verifier, 'coup')
+    debut = time.time()
+    une_table.dedier(Belote(), 3)
+    une_table.jouer()
+    print "partie suivie en {:.2f} s,".format(time.time() - debut), erreurs[0], "erreurs"
+    print "cartes exclues par place (dernier suivi) = ", [bin(masque).count('1')
+                                                          for masque in suivis[0].exclues]
+    # tirage de mains compatibles au milieu d'une donne
+    suivi = suivis[0]
+    hasard = random.Random(1)
+    mains = suivi.repartir(hasard)
+    print "mains tirées compatibles = ", mains is not None and all(
+        not mains[siege] & ~suivi.possibles(siege) for siege in range(4))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Distribution de donnes par lots, pour les études de Monte Carlo
+Les cartes de milliers de donnes sont battues en un seul appel vectorisé :
+une matrice (donnes x cartes) dont chaque ligne est une permutation du paquet.
+Chaque ligne est ensuite découpée en mains, une par joueur.
+Une main est une suite de rangs de cartes du paquet du jeu (voir jeu.paquet),
+elle se passe directement à une Donne qui n'a alors plus à battre ni distribuer.
+Ce module dépend de numpy.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import numpy as np
+
+from jeu import Donne
+
+
+class Lot(object):
+    """ Lot de donnes battues et distribuées d'un seul coup """
+    def __init__(self, nb_donnes, nb_cartes = 32, nb_joueurs = 4, graine = None):
+        hasard = np.random.RandomState(graine)
+        # le tri de tirages uniformes donne une permutation par ligne
+        tirages = hasard.random_sample((nb_donnes, nb_cartes))
+        self.permutations = np.argsort(tirages, axis = 1).astype(np.uint8)
+        # mains[donne, joueur] : les rangs des cartes du joueur dans la donne
+        self.mains = self.permutations.reshape(
+            nb_donnes, nb_joueurs, nb_cartes // nb_joueurs)
+
+    def __len__(self):
+        return self.mains.shape[0]
+
+    def masques(self):
+        """ retourne les mains sous forme de masques de bits (donnes x joueurs) """
+        bits = np.left_shift(np.uint64(1), self.mains.astype(np.uint64))
+        return np.bitwise_or.reduce(bits, axis = 2)
+
+    def donne(self, index, jeu, joueurs, tapis, pioche, hasard = None):
+        """ retourne la donne d'indice index, prête à être déroulée """
+        return Donne(jeu, joueurs, tapis, pioche, hasard, self.mains[index])
+
+
+if __name__=='__main__':
+    import time
+    from modele import Table, Joueur
+    from jeu import Jeu
+    print "tests de la distribution par lots"
+    debut = time.time()
+    lot = Lot(1000000, graine = 1)
+    print len(lot), "donnes distribuées en {:.3f} s".format(time.time() - debut)
+    print "mains de la première donne = ", lot.mains[0].tolist()
+    print "chaque donne utilise toutes les cartes : ", \
+          bool((np.bitwise_or.reduce(lot.masques(), axis = 1) == 2**32 - 1).all())
+
+    une_table = Table()
+    une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+    un_jeu = Jeu()
+    une_donne = lot.donne(0, un_jeu, une_table.joueurs, une_table.tapis, une_table.pioche)
+    une_donne.derouler()
+    print "scores = ", une_donne.scores.values(), "plis = ", len(une_donne.plis)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Index de la force des mains pour les enchères de la belote
+Il donne, pour une main et une couleur d'atout, une estimation des points
+que fera l'équipe qui prend à cet atout.
+Les estimations sont rangées dans une table indexée par une forme canonique
+de la main : la couleur d'atout d'abord, puis les 3 autres couleurs triées,
+car permuter les couleurs hors atout ne change pas la force d'une main.
+La forme canonique est elle-même une main, à l'atout 0 : une estimation est
+la moyenne des points de l'équipe qui la tient sur des donnes simulées,
+les cartes manquantes distribuées et les plis joués au hasard dans le
+respect des règles (voir belote.finir_au_hasard).
+Les enchères se font sur les 5 premières cartes (voir belote.py) : la table
+de toutes les mains de 5 cartes est précalculée et livrée avec le code
+(index_mains.bin, marshal). Une enchère ne coûte donc qu'une lecture.
+D'autres mains sont évaluées à la demande et gardées en mémoire seulement :
+la table ne s'écrit sur disque que par la commande de précalcul.
+
+Précalcul de la table (quelques minutes), après un changement de l'évaluation :
+    python encheres.py
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import itertools
+import marshal
+import os
+import random
+
+import logging
+logger = logging.getLogger("encheres")
+
+# disposition des cartes dans un masque : 8 bits par couleur, dans l'ordre
+# as, 7, 8, 9, 10, valet, dame, roi (voir belote.py)
+NB_COULEURS = 4
+NB_VALEURS = 8
+NB_CARTES = NB_COULEURS * NB_VALEURS
+COULEUR = (1 << NB_VALEURS) - 1
+# cartes d'une main complète, à 4 joueurs
+TAILLE_MAIN = NB_CARTES // 4
+# nombre de donnes simulées par estimation
+NB_ESSAIS = 24
+# version des estimations : une table d'une autre version est recalculée
+VERSION = 2
+
+FICHIER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_mains.bin')
+
+
+def cle(masque, atout):
+    """
+    retourne la forme canonique d'une main pour un atout :
+    les bits de l'atout, puis ceux des autres couleurs par ordre croissant,
+    réunis dans un entier
+    """
+    atouts = (masque >> (atout * NB_VALEURS)) & COULEUR
+    autres = sorted((masque >> (une * NB_VALEURS)) & COULEUR
+                    for une in range(NB_COULEURS) if une != atout)
+    return atouts | autres[0] << 8 | autres[1] << 16 | autres[2] << 24
+
+def evaluer(forme, nb_essais = NB_ESSAIS):
+    """
+    estime les points de l'équipe qui prend avec la main de forme canonique
+    forme (à l'atout 0), en moyenne sur nb_essais donnes simulées
+    """
+    # belote importe ce module
+    from belote import finir_au_hasard
+    # le même tirage pour une même forme : la table ne dépend pas de l'ordre du calcul
+    hasard = random.Random(forme)
+    inconnues = [rang for rang in range(NB_CARTES) if not forme >> rang & 1]
+    manquantes = TAILLE_MAIN - bin(forme).count('1')
+    total = 0
+    for _ in xrange(nb_essais):
+        hasard.shuffle(inconnues)
+        # le preneur à la place 0 complète sa main, les autres reçoivent la leur
+        mains = [forme, 0, 0, 0]
+        for rang in inconnues[:manquantes]:
+            mains[0] |= 1 << rang
+        for indice, rang in enumerate(inconnues[manquantes:]):
+            mains[1 + indice // TAILLE_MAIN] |= 1 << rang
+        # la place qui entame ne dépend pas du preneur
+        total += finir_au_hasard(mains, [], hasard.randrange(4), 0, hasard)[0]
+    return int(round(float(total) / nb_essais))
+
+
+class IndexMains(object):
+    """ Estimations des mains par forme canonique, enregistrables sur disque """
+    def __init__(self, fichier = FICHIER, evaluation = evaluer):
+        self.fichier = fichier
+        self.evaluation = evaluation
+        self.estimations = None
+        self.modifie = False
+
+    def charger(self):
+        """ lit la table sur le disque si elle existe et est de cette version """
+        self.estimations = {}
+        if self.fichier and os.path.exists(self.fichier):
+            with open(self.fichier, 'rb') as fichier:
+                contenu = marshal.load(fichier)
+            if isinstance(contenu, tuple) and contenu[0] == VERSION:
+                self.estimations = contenu[1]
+                logger.info("%d mains lues dans %s", len(self.estimations), self.fichier)
+            else:
+                logger.warning("%s d'une autre version, ignoré", self.fichier)
+        elif self.fichier:
+            logger.warning("%s absent : les mains seront évaluées à la demande, "
+                           "python encheres.py le précalcule", self.fichier)
+
+    def enregistrer(self):
+        """ écrit la table sur le disque si elle a changé """
+        if self.modifie and self.fichier:
+            # écrite à côté puis renommée : un lecteur ne voit jamais une table à moitié écrite
+            temporaire = '{}.{}'.format(self.fichier, os.getpid())
+            with open(temporaire, 'wb') as fichier:
+                marshal.dump((VERSION, self.estimations), fichier)
+            os.rename(temporaire, self.fichier)
+            self.modifie = False
+
+    def noter(self, forme):
+        """ évalue une forme encore inconnue et la garde en mémoire """
+        estimation = self.estimations[forme] = self.evaluation(forme)
+        self.modifie = True
+        return estimation
+
+    def estimer(self, masque, atout):
+        """ retourne l'estimation d'une main (un masque) pour un atout """
+        if self.estimations is None:
+            self.charger()
+        forme = cle(masque, atout)
+        estimation = self.estimations.get(forme)
+        if estimation is None:
+            # main encore inconnue de la table : évaluée une fois pour toutes
+            estimation = self.noter(forme)
+        return estimation
+
+    def meilleur_atout(self, masque):
+        """ retourne (estimation, atout) pour l'atout le plus favorable à la main """
+        return max((self.estimer(masque, atout), atout) for atout in range(NB_COULEURS))
+
+    def precalculer(self, nb_cartes = 5):
+        """ ajoute à la table toutes les mains de nb_cartes cartes """
+        if self.estimations is None:
+            self.charger()
+        # la forme ne dépend pas de l'atout choisi : l'atout 0 suffit
+        for cartes in itertools.combinations(range(NB_CARTES), nb_cartes):
+            forme = cle(sum(1 << rang for rang in cartes), 0)
+            if forme not in self.estimations:
+                self.noter(forme)
+        return len(self.estimations)
+
+# l'index partagé par les jeux qui ne fournissent pas le leur
+index_commun = IndexMains()
+
+
+if __name__=='__main__':
+    import time
+    print "précalcul de l'index des mains de 5 cartes"
+    debut = time.time()
+    print index_commun.precalculer(5), "formes canoniques",
+    print "en {:.1f} s".format(time.time() - debut)
+    index_commun.enregistrer()
+    # valet, 9, as d'atout (carreau) et as de pique
+    main = (1 << 5) | (1 << 3) | (1 << 0) | (1 << 8)
+    print "meilleur atout = ", index_commun.meilleur_atout(main)
+    # estimations moyennes selon le nombre d'atouts des mains de 5 cartes
+    par_atouts = {}
+    for forme, estimation in index_commun.estimations.iteritems():
+        if bin(forme).count('1') == 5:
+            par_atouts.setdefault(bin(forme & COULEUR).count('1'), []).append(estimation)
+    print "estimation moyenne par nombre d'atouts = ", \
+          [(nombre, sum(valeurs) // len(valeurs)) for nombre, valeurs in sorted(par_atouts.items())]
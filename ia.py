@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Joueurs simulés de la belote
+Un joueur Monte Carlo choisit sa carte en simulant des fins de donne :
+- il tire des répartitions des cartes qu'il ne voit pas, compatibles avec
+  ce qui a été joué, le nombre de cartes restant à chaque joueur et
+  les couleurs et atouts qu'ils n'ont plus (voir croyances.py),
+- pour chacune, il joue chaque carte permise puis finit la donne au hasard,
+- il garde la carte qui rapporte en moyenne le plus à son équipe
+  par rapport à l'autre.
+Chaque décision est bornée par une durée et un nombre de simulations,
+les simulations peuvent être réparties sur plusieurs processus.
+Les simulations tirent leurs cartes d'un générateur propre à la décision,
+dont la graine dépend de la position et d'une graine du joueur, tirée une
+fois de celle de la partie quand il la rejoint : le nombre de simulations
+faites, qui dépend du temps, ne change ni les donnes suivantes ni les choix
+des autres joueurs, et une décision retrouvée sans simulation (voir
+cache.py) ne change pas les suivantes.
+Le joueur ne connaît que ce que voit tout joueur à la table : sa main,
+le tapis, les plis joués, l'atout et les places des joueurs.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from multiprocessing import Pool
+import random
+import time
+
+from modele import Joueur
+from belote import finir_au_hasard
+from croyances import Croyances, repartir
+import journal
+
+import logging
+logger = logging.getLogger("ia")
+
+
+class Situation(object):
+    """ Ce qu'un joueur sait d'une donne au moment de jouer """
+    def __init__(self, siege, main, inconnues, restantes, rangs, premier, atout, exclues = None):
+        # sa place et le masque de sa main
+        self.siege = siege
+        self.main = main
+        # masque des cartes ni jouées ni en main, et nombre de cartes par place
+        self.inconnues = inconnues
+        self.restantes = restantes
+        # masques des cartes que chaque place ne peut pas avoir
+        self.exclues = exclues if exclues is not None else [0] * len(restantes)
+        # le pli en cours et la place qui l'a entamé
+        self.rangs = rangs
+        self.premier = premier
+        self.atout = atout
+
+    def repartir(self, hasard):
+        """ retourne les masques de 4 mains compatibles avec la situation """
+        return repartir(self.siege, self.main, self.inconnues, self.restantes,
+                        self.exclues, hasard)
+
+def simuler(situation, options, nb_max, echeance, hasard):
+    """
+    simule des fins de donne pour chaque option (rangs de cartes)
+    jusqu'à nb_max simulations ou l'échéance
+    retourne la somme des écarts de points et le nombre de simulations par option
+    """
+    sommes = [0] * len(options)
+    nombre = 0
+    equipe = situation.siege % 2
+    while nombre < nb_max and time.time() < echeance:
+        # une même répartition pour toutes les options
+        mains = situation.repartir(hasard)
+        for indice, rang in enumerate(options):
+            essai = list(mains)
+            essai[situation.siege] &= ~(1 << rang)
+            equipes = finir_au_hasard(essai, situation.rangs + [rang],
+                                      situation.premier, situation.atout, hasard)
+            sommes[indice] += equipes[equipe] - equipes[1 - equipe]
+        nombre = nombre + 1
+    return sommes, nombre
+
+def _simuler(tache):
+    """ point d'entrée des processus : une tache porte sa propre graine """
+    situation, options, nb_max, echeance, graine = tache
+    return simuler(situation, options, nb_max, echeance, random.Random(graine))
+
+
+class JoueurMonteCarlo(Joueur):
+    """ Joueur qui simule des fins de donne pour choisir sa carte """
+    def __init__(self, nom, visible = False, budget_temps = 0.05,
+                 budget_simulations = 200, nb_processus = 1):
+        Joueur.__init__(self, nom, visible)
+        # durée maximale d'une décision, en secondes
+        self.budget_temps = budget_temps
+        # nombre maximal de répartitions simulées par décision
+        self.budget_simulations = budget_simulations
+        self.nb_processus = nb_processus
+        # créé à la première décision qui en a besoin
+        self.pool = None
+        # le tapis sur lequel le joueur est en train de jouer
+        self.tapis = None
+        # ce que le joueur sait des autres mains, tenu à jour à chaque coup
+        self.croyances = Croyances(self)
+        # la graine des simulations, distincte du générateur de la partie
+        self.graine = random.getrandbits(63)
+
+    def rejoindre(self, hasard):
+        Joueur.rejoindre(self, hasard)
+        # tirée une seule fois : une même partie donne les mêmes simulations
+        self.graine = (hasard if hasard is not None else random).getrandbits(63)
+
+    def jouer(self, tapis, jeu):
+        if self.croyances.tapis is not tapis:
+            self.croyances.suivre(tapis)
+        self.tapis = tapis
+        Joueur.jouer(self, tapis, jeu)
+
+    def observer(self):
+        """ retourne la situation vue depuis la place du joueur """
+        tapis = self.tapis
+        croyances = self.croyances
+        croyances.actualiser(tapis)
+        rangs = [carte.rang for _, carte in tapis]
+        return Situation(croyances.siege, self.main.masque, croyances.inconnues,
+                         list(croyances.restantes), rangs,
+                         (croyances.siege - len(rangs)) % len(tapis.joueurs), tapis.atout,
+                         list(croyances.exclues))
+
+    def choisir(self, options):
+        """ choisit l'option qui rapporte le plus en moyenne sur les simulations """
+        if len(options) == 1:
+            return 0
+        situation = self.observer()
+        # le générateur de la décision ne dépend que de la position
+        hasard = random.Random(hash((self.graine, situation.main, situation.inconnues,
+                                     tuple(situation.rangs))))
+        rangs = [carte.rang for carte in options]
+        echeance = time.time() + self.budget_temps
+        if self.nb_processus > 1:
+            if self.pool is None:
+                self.pool = Pool(self.nb_processus)
+            part = -(-self.budget_simulations // self.nb_processus)
+            taches = [(situation, rangs, part, echeance, hasard.getrandbits(63))
+                      for _ in range(self.nb_processus)]
+            resultats = self.pool.map(_simuler, taches)
+        else:
+            resultats = [simuler(situation, rangs, self.budget_simulations, echeance, hasard)]
+        sommes = [sum(somme[indice] for somme, _ in resultats) for indice in range(len(rangs))]
+        nombre = sum(nombre for _, nombre in resultats)
+        if journal.detaille(logger, logging.DEBUG):
+            logger.debug("%s : %d simulations", self.nom, nombre)
+        return max(range(len(rangs)), key = lambda indice: sommes[indice])
+
+    def fermer(self):
+        """ arrête les processus de simulation et le suivi du tapis """
+        self.croyances.abandonner()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+if __name__=='__main__':
+    from modele import Table
+    from belote import Belote
+    print "tests du joueur Monte Carlo"
+    une_table = Table()
+    une_table.accueuillir(JoueurMonteCarlo("un"), Joueur("deux"),
+                          JoueurMonteCarlo("trois"), Joueur("quatre"))
+    debut = time.time()
+    une_table.dedier(Belote(nb_max_points = 0, nb_max_donnes = 10), 1)
+    une_table.jouer()
+    print "10 donnes en {:.1f} s".format(time.time() - debut)
+    for joueur, points in une_table.feuille_de_points.iteritems():
+        print joueur.nom, points
+    # les donnes d'une partie ne dépendent que de sa graine, pas du nombre de simulations
+    distribuees = []
+    for budget in (5, 100):
+        une_table = Table()
+        une_table.accueuillir(*[JoueurMonteCarlo(nom, budget_simulations = budget)
+                                for nom in ("un", "deux", "trois", "quatre")])
+        une_table.dedier(Belote(nb_max_points = 0, nb_max_donnes = 3), 1)
+        une_table.jouer()
+        distribuees.append([une_donne.mains_initiales for une_donne in une_table.partie.donnes])
+    print "mêmes donnes avec 5 ou 100 simulations = ", distribuees[0] == distribuees[1]
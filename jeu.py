@@ -9,7 +9,8 @@ Il définit les classes et leurs interactions nécessaires au déroulement du je
 Son interface appelée est :
 - le constructeur de la classe Jeu,
 - la méthode creer_partie() de la classe Jeu,
-- la méthode derouler() de l'objet retourné par creer_partie().
+- la méthode derouler() de l'objet retourné par creer_partie(),
+- la méthode options() de la classe Jeu qui donne les cartes qu'un joueur peut jouer.
 Il respecte les contraintes :
 - les paramètres passés à la méthode creer_partie ne sont pas détruits,
 - ils sont modifiés pour refléter l'évolution du jeu,
@@ -19,6 +20,12 @@ Les arguments nécessaires pour la méthode creer_partie sont :
 - le tapis,
 - la pioche,
 - la feuille de points.
+Une graine peut lui être passée en plus pour rendre la partie reproductible,
+ainsi que la façon de conserver les donnes finies :
+- COMPLET : les donnes et leurs points sont gardés (par défaut),
+- RESUME : seul un résumé de chaque donne est gardé,
+- FLUX : chaque donne est passée au puits (une fonction) puis oubliée,
+  la mémoire d'une partie ne croît plus avec le nombre de donnes.
 Les arguments possibles pour la construction d'un jeu sont :
 - le nom du jeu (Basique par défaut)
 - le nombre de cartes du jeu (32 ou 54, 32 par défaut)
@@ -31,12 +38,46 @@ Licence CeCill v2
 janvier 2017
 """
 from modele import Carte
+# pour ne signaler qu'une fois chaque main distribuée
+from support import regrouper
+# pour mesurer la durée des étapes et des parties quand c'est demandé
+import mesure
+# pour ne journaliser le détail que des parties choisies
+import journal
 # utilisé quand il faut battre les cartes
-from random import shuffle
+import random
 
 import logging
 logger = logging.getLogger("jeu")
 
+# façons de conserver les donnes finies d'une partie
+COMPLET = 'complet'
+RESUME = 'resume'
+FLUX = 'flux'
+
+# paquets déjà créés, par nombre de cartes
+_paquets = {}
+
+def paquet(nb_cartes):
+    """
+    retourne le tuple des cartes d'un jeu de nb_cartes
+    les cartes sont créées une seule fois puis partagées par toutes les donnes,
+    leur rang est leur position dans le paquet
+    """
+    if nb_cartes not in _paquets:
+        couleurs = range(4)
+        # les valeurs sont en rapport avec les chiffres des cartes
+        # les points associés à ces valeurs dépendent du jeu
+        temp = range(14)
+        if nb_cartes == 32:
+            valeurs = temp[1:2] + temp[7:]
+        else:
+            valeurs = temp[1:]
+        cartes = [(couleur, valeur) for couleur in couleurs for valeur in valeurs]
+        _paquets[nb_cartes] = tuple(Carte(couleur, valeur, rang)
+                                    for rang, (couleur, valeur) in enumerate(cartes))
+    return _paquets[nb_cartes]
+
 
 class Jeu(object):
     """ Jeu de cartes """
@@ -48,21 +89,12 @@ class Jeu(object):
         # nombre maximal de points pour finir la partie
         self.nb_max_points = nb_max_points
 
-        # ensemble de cartes utilisées
+        # ensemble de cartes utilisées, partagé avec les autres jeux
+        self.cartes = paquet(nb_cartes)
         def generateur_cartes():
-            couleurs = range(4)
-            # les valeurs sont en rapport avec les chiffres des cartes
-            # les points associés à ces valeurs dépendent du jeu
-            temp = range(14)
-            if nb_cartes == 32:
-                valeurs = temp[1:2] + temp[7:]
-            else:
-                valeurs = temp[1:]
             """generateur de jeu de cartes"""
-            for couleur in couleurs:
-                for valeur in valeurs:
-                    carte = Carte(couleur, valeur)
-                    yield carte
+            for carte in self.cartes:
+                yield carte
         # ! attribut du jeu qui est une fonction génératrice,
         # et non une méthode de la classe
         self.creer_cartes = generateur_cartes
@@ -70,28 +102,41 @@ class Jeu(object):
         # définition des étapes d'une partie
         def battre(une_partie):
             """ bat les cartes à distribuer"""
-            logger.info("Jeu mélangé")
-            shuffle(une_partie.pioche)
+            if une_partie.mains is not None:
+                # donne déjà distribuée, rien à battre
+                return
+            if journal.detaille(logger):
+                logger.info("Jeu mélangé")
+            hasard = une_partie.hasard if une_partie.hasard is not None else random
+            hasard.shuffle(une_partie.pioche)
 
         def distribuer(une_partie):
             """ distribution de toutes les cartes aux joueurs"""
+            if une_partie.mains is not None:
+                # mains fixées à l'avance : rangs des cartes de chaque joueur
+                cartes = une_partie.jeu.cartes
+                for joueur, main in zip(une_partie.joueurs, une_partie.mains):
+                    joueur.recevoir([cartes[rang] for rang in main])
+                return
             # par défaut toutes les cartes
-            while len(une_partie.pioche):
-                for joueur in une_partie.joueurs:
-                    joueur.recevoir(une_partie.pioche.pop())
+            with regrouper(*une_partie.joueurs):
+                while len(une_partie.pioche):
+                    for joueur in une_partie.joueurs:
+                        joueur.recevoir(une_partie.pioche.pop())
 
         def jouer(une_partie):
             """ joue la partie """
             nb_plis = nb_cartes / len(une_partie.joueurs)
             while len(une_partie.plis) < nb_plis:
-                for joueur in une_partie.joueurs:
+                # un pli commencé (partie restaurée) reprend au joueur suivant
+                for joueur in une_partie.joueurs[len(une_partie.tapis):]:
                     joueur.jouer(une_partie.tapis, une_partie.jeu)
                 # pour compter les poins à la fin, copie nécessaire
                 une_partie.plis.append([coup for coup in une_partie.tapis])
                 # vider le tapis existant et non le réinitialiser vide
                 del une_partie.tapis[0:]
                 # pour surveiller le tapis, signale un changement
-                une_partie.tapis.change()
+                une_partie.tapis.change('pli')
 
         def compter(une_donne):
             """ compter les points """
@@ -102,49 +147,101 @@ class Jeu(object):
         # definition du processus de déroulement d'un donne
         self.plan_donne = (battre, distribuer, jouer, compter)
                 
-    def creer_partie(self, joueurs, tapis, pioche, feuille_de_points):
+    def options(self, joueur, tapis):
+        """ retourne les cartes que le joueur peut jouer sur le tapis """
+        # par défaut, toute la main
+        return joueur.main
+
+    def creer_partie(self, joueurs, tapis, pioche, feuille_de_points, graine = None,
+                     retention = COMPLET, puits = None):
         """ 
         Initialise le jeu avec les éléments du contexte passés en paramètres
         Retourne un objet (de type Partie) qui supporte la méthode derouler()
         """
-        return Partie(self, joueurs, tapis, pioche, feuille_de_points)
+        return Partie(self, joueurs, tapis, pioche, feuille_de_points, graine, retention, puits)
 
 class Partie(object):
     """ Partie de cartes """
-    def __init__(self, jeu, joueurs, tapis, pioche, feuille_de_points):
+    def __init__(self, jeu, joueurs, tapis, pioche, feuille_de_points, graine = None,
+                 retention = COMPLET, puits = None):
         self.jeu = jeu
+        if retention not in (COMPLET, RESUME, FLUX):
+            raise ValueError("conservation des donnes inconnue : {}".format(retention))
+        if retention == FLUX and puits is None:
+            raise ValueError("la conservation en flux demande un puits")
+        self.retention = retention
+        self.puits = puits
+        # une graine donne à la partie son propre générateur aléatoire,
+        # partagé par les donnes et les joueurs, sinon celui du module
+        self.hasard = random.Random(graine) if graine is not None else None
+        for joueur in joueurs:
+            joueur.rejoindre(self.hasard)
         # mémoriser les données nécessaires à une donne pour créer les suivantes
         self.joueurs = joueurs
         self.tapis = tapis
         self.pioche = pioche
         self.feuille_de_points = feuille_de_points
         # prépare la première la donne à être jouée
-        self.donne_en_cours = Donne(self.jeu, self.joueurs, self.tapis, self.pioche)
-        # toutes les donnes jouées de la partie
+        self.donne_en_cours = Donne(self.jeu, self.joueurs, self.tapis, self.pioche, self.hasard)
+        # les donnes jouées de la partie, ou leurs résumés, selon la conservation
         self.donnes = []
+        # pour enregistrer la partie au fil des donnes (voir archive.py, colonnes.py) :
+        # chacun reçoit chaque donne finie (noter_donne) puis la partie terminée (ecrire)
+        self.enregistreurs = []
+        # le nombre de donnes finies
+        self.nb_donnes = 0
         
     # pour qu'une partie puisse enchaîner plusieurs donnes
-    def derouler(self):
+    def derouler(self, reprise = False):
         """ enchaine les donnes jusqu'à la fin du jeu """
-        nb_donnes = 0
-        self.feuille_de_points.vider()
+        instruments = mesure.instruments
+        if instruments is None:
+            self.enchainer(reprise)
+        else:
+            debut = mesure.horloge()
+            self.enchainer(reprise)
+            instruments.noter('partie', mesure.horloge() - debut)
+
+    def reprendre(self):
+        """ poursuit une partie restaurée là où elle en était (voir sauvegarde.py) """
+        self.derouler(True)
+
+    def enchainer(self, reprise = False):
+        """ enchaine les donnes jusqu'à la fin du jeu """
+        if not reprise:
+            self.nb_donnes = 0
+            journal.nouvelle_partie()
+            self.feuille_de_points.vider()
+        elif self.donne_en_cours.etape == len(self.donne_en_cours.plan):
+            # restaurée entre 2 donnes : la dernière est déjà comptée
+            if self.est_finie(self.feuille_de_points, self.nb_donnes):
+                self.proclamer()
+                self.feuille_de_points.change('partie')
+                return
+            self.donne_en_cours = Donne(self.jeu, self.joueurs, self.tapis, self.pioche, self.hasard,
+                                        numero = self.nb_donnes)
         while True:
             self.donne_en_cours.derouler()
-            nb_donnes = nb_donnes + 1
+            self.nb_donnes = self.nb_donnes + 1
             # cumule les points de chaque donne 
             # conserve les donnes jouées en mémoire pour plus tard
             self.cumuler(self.donne_en_cours)
-            self.feuille_de_points.change()
+            for enregistreur in self.enregistreurs:
+                enregistreur.noter_donne(self.donne_en_cours)
+            self.feuille_de_points.change('donne')
             # déterminer la fin la jeu selon la règle ad hoc
-            if self.est_finie(self.feuille_de_points, nb_donnes):
+            if self.est_finie(self.feuille_de_points, self.nb_donnes):
                 # détermine les gagnants
                 self.proclamer()
-                self.feuille_de_points.change()
+                for enregistreur in self.enregistreurs:
+                    enregistreur.ecrire(self)
+                self.feuille_de_points.change('partie')
                 # mémorise l'ensemble des donnes jouées (plus tard)
                 break
             else:
                 # continuer la partie avec une nouvelle donne
-                self.donne_en_cours = Donne(self.jeu, self.joueurs, self.tapis, self.pioche)
+                self.donne_en_cours = Donne(self.jeu, self.joueurs, self.tapis, self.pioche, self.hasard,
+                                            numero = self.nb_donnes)
                 continue
 
     def cumuler(self, une_donne):
@@ -152,8 +249,14 @@ class Partie(object):
         cumuler les points d'une donne dans le résultat de la partie
         par addition des points pour chaque joueur
         """
-        self.donnes.append(une_donne)
-        self.feuille_de_points.partiels.append(une_donne.scores)
+        if self.retention == COMPLET:
+            self.donnes.append(une_donne)
+            self.feuille_de_points.partiels.append(une_donne.scores)
+        elif self.retention == RESUME:
+            self.donnes.append(resumer(une_donne))
+            self.feuille_de_points.partiels.append(une_donne.scores)
+        else:
+            self.puits(une_donne)
         if self.feuille_de_points:
             for joueur, points in une_donne.scores.iteritems():
                 self.feuille_de_points[joueur] = \
@@ -169,8 +272,11 @@ class Partie(object):
         self.feuille_de_points.champions = set()
         for joueur, points in self.feuille_de_points.iteritems():
             # pour accepter les ex-eaquo, il faut aussi l'égalité
-            if points >= max:
+            if points > max:
+                # un meilleur score écarte les champions précédents
                 max = points
+                self.feuille_de_points.champions = set([joueur])
+            elif points == max:
                 self.feuille_de_points.champions.add(joueur)
         self.feuille_de_points.champions_changed = True
 
@@ -192,28 +298,52 @@ class Partie(object):
                 decision = True
         else:
             # il manque la définition pour au moins un des 2 critères
-            logger.error("nb max de point = {} et nb max donnes ={}"\
-            .format(self.jeu.nb_max_points, self.jeu.nb_max_donnes))
+            logger.error("nb max de point = %s et nb max donnes = %s",
+                         self.jeu.nb_max_points, self.jeu.nb_max_donnes)
             # par précaution, la partie d'arrête pour éviter la boucle infinie
             decision = True
         return decision    
                 
                 
+def resumer(une_donne):
+    """ retourne le résumé d'une donne finie, sans ses cartes """
+    return {'scores': dict(une_donne.scores),
+            'contrat': getattr(une_donne, 'contrat', None),
+            'nb_plis': len(une_donne.plis)}
+
 class Donne(object):
     """ Donne d'une partie de cartes """
-    def __init__(self, jeu, joueurs, tapis, pioche):
+    def __init__(self, jeu, joueurs, tapis, pioche, hasard = None, mains = None, numero = 0):
         self.jeu = jeu
+        self.hasard = hasard
+        # le nombre de donnes jouées avant elle dans la partie, pour faire tourner la main
+        self.numero = numero
         self.pioche = pioche
-        self.pioche.extend([cartes for cartes in jeu.creer_cartes()])
+        # les mains peuvent être données à l'avance (rangs des cartes par joueur),
+        # elles remplacent alors le battage et la distribution de la pioche
+        self.mains = mains
+        if mains is None:
+            self.pioche.extend([cartes for cartes in jeu.creer_cartes()])
         self.joueurs = joueurs
         self.tapis = tapis
         self.plan = jeu.plan_donne
         self.plis = []
         self.scores = {}
+        # l'indice de l'étape en cours dans le plan, pour reprendre une donne restaurée
+        self.etape = 0
 
     def derouler(self):
-        for etapes in self.plan:
-            etapes(self)
+        instruments = mesure.instruments
+        plan = self.plan
+        while self.etape < len(plan):
+            etape = plan[self.etape]
+            if instruments is None:
+                etape(self)
+            else:
+                debut = mesure.horloge()
+                etape(self)
+                instruments.noter('etape.' + etape.__name__, mesure.horloge() - debut)
+            self.etape = self.etape + 1
 
 if __name__=='__main__':
     from modele import Table, Joueur
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Journal structuré et non bloquant du jeu
+Les messages du jeu sont confiés à une file bornée ; un fil d'exécution
+en arrière-plan les met en forme et les écrit, une ligne JSON par message :
+le jeu ne fait ni mise en forme ni écriture. Quand la file est pleine,
+les messages sont perdus et comptés plutôt que de ralentir le jeu.
+Le détail (messages INFO et DEBUG) peut n'être gardé que pour une partie
+sur n : les autres ne journalisent que les avertissements et les erreurs.
+Le choix est propre à chaque partie, noté pour le fil d'exécution qui la
+joue : des parties jouées en même temps (voir serveur.py) ne se gênent pas.
+Les parties sont numérotées dans chaque fil, chaque ligne donne son fil.
+Les messages de détail fréquents (chaque carte jouée) sont précédés d'un
+test, detaille(logger) : pour une partie non détaillée, ils ne sont même
+pas créés.
+Rien n'est configuré à l'import : c'est à l'appelant de le faire.
+
+Utilisation :
+    journal.configurer('belote.log', echantillonnage = 1000)
+    ... parties ...
+    journal.arreter()
+et dans le jeu :
+    if journal.detaille(logger):
+        logger.info("%s joue %s", nom, carte)
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import atexit
+import json
+import logging
+import threading
+import Queue
+
+# le gestionnaire en service, une partie sur echantillonnage est détaillée
+gestionnaire = None
+echantillonnage = 1
+# pour chaque fil, le numéro de la partie qu'il joue et si elle est détaillée
+en_cours = threading.local()
+
+
+class FiltreParties(logging.Filter):
+    """ Note le numéro de la partie du fil, n'en garde le détail que si elle est choisie """
+    def filter(self, record):
+        record.partie = getattr(en_cours, 'numero', 0)
+        return record.levelno >= logging.WARNING or getattr(en_cours, 'detaillee', True)
+
+
+class GestionnaireFile(logging.Handler):
+    """ Confie les messages à une file, écrite par un fil en arrière-plan """
+    def __init__(self, chemin, taille_file = 10000):
+        logging.Handler.__init__(self)
+        self.file = Queue.Queue(taille_file)
+        self.perdus = 0
+        self.sortie = open(chemin, 'a')
+        self.ecrivain = threading.Thread(target = self.ecrire, name = "journal")
+        self.ecrivain.daemon = True
+        self.ecrivain.start()
+
+    def emit(self, record):
+        # le numéro de partie est noté par le filtre, la mise en forme plus tard
+        try:
+            self.file.put_nowait(record)
+        except Queue.Full:
+            self.perdus = self.perdus + 1
+
+    def mettre_en_forme(self, record):
+        return json.dumps({'temps': record.created, 'journal': record.name,
+                           'niveau': record.levelname, 'fil': record.threadName,
+                           'partie': record.partie,
+                           'message': record.getMessage()})
+
+    def ecrire(self):
+        """ boucle du fil d'écriture, jusqu'à recevoir None """
+        while True:
+            record = self.file.get()
+            if record is None:
+                break
+            try:
+                self.sortie.write(self.mettre_en_forme(record) + '\n')
+            except Exception:
+                self.handleError(record)
+            # écriture groupée : le fichier n'est vidé que si la file l'est
+            if self.file.empty():
+                self.sortie.flush()
+        self.sortie.flush()
+
+    def close(self):
+        if self.ecrivain.is_alive():
+            self.file.put(None)
+            self.ecrivain.join()
+            self.sortie.close()
+        logging.Handler.close(self)
+
+def configurer(chemin, niveau = logging.DEBUG, echantillonnage = 1, taille_file = 10000):
+    """
+    envoie les messages du jeu dans le fichier chemin, en arrière-plan
+    seule une partie sur echantillonnage journalise son détail
+    """
+    global gestionnaire
+    arreter()
+    globals()['echantillonnage'] = echantillonnage
+    gestionnaire = GestionnaireFile(chemin, taille_file)
+    gestionnaire.addFilter(FiltreParties())
+    racine = logging.getLogger()
+    racine.addHandler(gestionnaire)
+    racine.setLevel(niveau)
+    return gestionnaire
+
+def nouvelle_partie():
+    """ signale le début d'une partie dans ce fil, pour choisir si elle est détaillée """
+    en_cours.numero = getattr(en_cours, 'numero', 0) + 1
+    en_cours.detaillee = echantillonnage <= 1 or en_cours.numero % echantillonnage == 1
+
+def detaille(logger, niveau = logging.INFO):
+    """
+    retourne vrai si un message de détail de ce niveau est à créer :
+    la partie du fil est détaillée et le logger accepte ce niveau
+    """
+    return getattr(en_cours, 'detaillee', True) and logger.isEnabledFor(niveau)
+
+def arreter():
+    """ écrit les messages en attente et retire le gestionnaire """
+    global gestionnaire
+    if gestionnaire is not None:
+        logging.getLogger().removeHandler(gestionnaire)
+        gestionnaire.close()
+        gestionnaire = None
+
+atexit.register(arreter)
+
+
+if __name__=='__main__':
+    import os
+    import tempfile
+    import time
+    # le module lancé n'est pas celui importé par le jeu
+    import journal
+    from modele import Table, Joueur
+    from belote import Belote
+    print "tests du journal"
+    def jouer(nom, nb_parties):
+        une_table = Table()
+        une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+        for graine in range(nb_parties):
+            une_table.dedier(Belote(), graine)
+            une_table.jouer()
+    # le coût du journal échantillonné, comparé au jeu sans journal
+    debut = time.time()
+    jouer("seul", 300)
+    muet = time.time() - debut
+    chemin = os.path.join(tempfile.mkdtemp(), 'belote.log')
+    journal.configurer(chemin, echantillonnage = 1000)
+    debut = time.time()
+    jouer("seul", 300)
+    print "300 parties en {:.2f} s sans journal, {:.2f} s avec une sur 1000 détaillée".format(
+        muet, time.time() - debut)
+    journal.arreter()
+
+    chemin = os.path.join(os.path.dirname(chemin), 'parties.log')
+    journal.configurer(chemin, echantillonnage = 100)
+    # 4 tables en même temps, chacune dans son fil
+    fils = [threading.Thread(target = jouer, args = (numero, 250), name = "table{}".format(numero))
+            for numero in range(4)]
+    debut = time.time()
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    print "1000 parties sur 4 fils en {:.2f} s".format(time.time() - debut)
+    perdus = journal.gestionnaire.perdus
+    journal.arreter()
+    with open(chemin) as fichier:
+        lignes = [json.loads(ligne) for ligne in fichier]
+    print len(lignes), "lignes,", perdus, "perdues, parties détaillées = ", \
+          sorted(set((ligne['fil'], ligne['partie']) for ligne in lignes))
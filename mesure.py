@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentation du déroulement d'un jeu de cartes
+Quand elle est activée, elle enregistre la durée :
+- de chaque étape du plan d'une donne (etape.battre, etape.jouer...),
+- de chaque décision d'un joueur, par classe de joueur (choisir.Joueur...),
+- de chaque partie (partie).
+Les durées sont rangées dans des histogrammes à classes de largeur doublée,
+lisibles sous forme de dictionnaire ou de texte.
+Désactivée, elle ne coûte qu'un test à chaque point de mesure.
+
+Utilisation :
+    instruments = mesure.activer()
+    ... parties ...
+    print instruments.texte()
+    mesure.desactiver()
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from timeit import default_timer as horloge
+
+# les instruments en service, None quand l'instrumentation est désactivée
+instruments = None
+
+
+class Histogramme(object):
+    """ Répartition de durées en classes de 1, 2, 4, 8... microsecondes """
+    def __init__(self):
+        self.nombre = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        # effectif par classe : la classe k compte les durées < 2**k µs
+        self.classes = {}
+
+    def ajouter(self, duree):
+        self.nombre = self.nombre + 1
+        self.total = self.total + duree
+        if self.minimum is None or duree < self.minimum:
+            self.minimum = duree
+        if self.maximum is None or duree > self.maximum:
+            self.maximum = duree
+        classe = int(duree * 1e6).bit_length()
+        self.classes[classe] = self.classes.get(classe, 0) + 1
+
+    def moyenne(self):
+        return self.total / self.nombre if self.nombre else 0.0
+
+    def instantane(self):
+        """ retourne l'état de l'histogramme sous forme de dictionnaire """
+        return {'nombre': self.nombre, 'total': self.total,
+                'moyenne': self.moyenne(),
+                'minimum': self.minimum, 'maximum': self.maximum,
+                'classes': dict((2 ** classe, effectif)
+                                for classe, effectif in self.classes.iteritems())}
+
+class Instruments(object):
+    """ Histogrammes des durées mesurées, par nom de mesure """
+    def __init__(self):
+        self.histogrammes = {}
+
+    def noter(self, nom, duree):
+        """ ajoute une durée, en secondes, à la mesure nommée """
+        histogramme = self.histogrammes.get(nom)
+        if histogramme is None:
+            histogramme = self.histogrammes[nom] = Histogramme()
+        histogramme.ajouter(duree)
+
+    def instantane(self):
+        """ retourne toutes les mesures sous forme de dictionnaire """
+        return dict((nom, histogramme.instantane())
+                    for nom, histogramme in self.histogrammes.iteritems())
+
+    def texte(self):
+        """ retourne toutes les mesures sous forme de tableau """
+        lignes = ["{:<24} {:>9} {:>12} {:>12} {:>12}".format(
+            "mesure", "nombre", "moyenne µs", "min µs", "max µs")]
+        for nom, histogramme in sorted(self.histogrammes.iteritems()):
+            lignes.append("{:<24} {:>9} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                nom, histogramme.nombre, histogramme.moyenne() * 1e6,
+                histogramme.minimum * 1e6, histogramme.maximum * 1e6))
+            repartition = ["<{}µs:{}".format(2 ** classe, effectif)
+                           for classe, effectif in sorted(histogramme.classes.iteritems())]
+            lignes.append("    " + " ".join(repartition))
+        return "\n".join(lignes)
+
+    def vider(self):
+        self.histogrammes.clear()
+
+def activer():
+    """ met en service de nouveaux instruments et les retourne """
+    global instruments
+    instruments = Instruments()
+    return instruments
+
+def desactiver():
+    """ arrête les mesures, retourne les instruments qui étaient en service """
+    global instruments
+    anciens, instruments = instruments, None
+    return anciens
+
+
+if __name__=='__main__':
+    # le module lancé n'est pas celui importé par le jeu
+    import mesure
+    from controleur import simuler
+    print "tests de l'instrumentation"
+    mesure.activer()
+    simuler(200, 1)
+    print mesure.desactiver().texte()
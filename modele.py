@@ -16,7 +16,11 @@ novembre 2016
 # utilisé pour surveiller le tapis et autres objets de la table
 from support import Observable
 # utilisé quand il faut prendre une décision "au pif"
-from random import randint
+import random
+# pour mesurer la durée des décisions quand c'est demandé
+import mesure
+# pour ne créer les messages de détail que des parties détaillées
+import journal
 
 import logging
 logger = logging.getLogger("modele")
@@ -28,10 +32,16 @@ class Joueur(Observable):
         # rend visibles ou non ses cartes
         self.visible = visible
         # les cartes dont dispose le joueur
-        self.main = []
+        self.main = Main()
+        # générateur aléatoire propre à une partie (celui du module sinon)
+        self.hasard = None
         # pour pouvoir signaler les changements d'état à la vue
         Observable.__init__(self)
 
+    def rejoindre(self, hasard):
+        """ prend place dans une partie qui lui donne son générateur aléatoire (None : le module) """
+        self.hasard = hasard
+
     def recevoir(self, donne):
         """ ajoute la donne à la main du joueur"""
         # pour accepter les cas où la donne a une ou plusieurs cartes
@@ -39,26 +49,45 @@ class Joueur(Observable):
             self.main.extend(donne)
         else:
             self.main.append(donne)
-        self.change()
+        self.change('main')
 
     def choisir(self, options):
         """ choisit aléatoirement parmi les options"""
-        return randint(0, len(options)-1) if len(options)> 1 else 0
+        hasard = self.hasard if self.hasard is not None else random
+        return hasard.randint(0, len(options)-1) if len(options)> 1 else 0
 
-    def donner_une_carte(self):
-        """ retourne une carte qui est retirée de la main du joueur"""
-        return self.main.pop(self.choisir(self.main))
+    def donner_une_carte(self, options = None):
+        """
+        retourne une carte qui est retirée de la main du joueur
+        choisie parmi les options, toute la main par défaut
+        """
+        if options is None:
+            options = self.main
+        instruments = mesure.instruments
+        if instruments is None:
+            choix = self.choisir(options)
+        else:
+            debut = mesure.horloge()
+            choix = self.choisir(options)
+            instruments.noter('choisir.' + self.__class__.__name__, mesure.horloge() - debut)
+        if options is self.main:
+            return self.main.pop(choix)
+        carte = options[choix]
+        self.main.remove(carte)
+        return carte
 
     def jouer(self, tapis, jeu):
         """ met une carte sur le tapis en fonction du tapis selon les règles du jeu"""
-        # pas de réflexion, pas de suivi des règles du jeu par défaut
-        carte = self.donner_une_carte()
-        logger.info("{} joue {}".format(self.nom, carte))
+        # pas de réflexion, le jeu donne les cartes permises par ses règles
+        carte = self.donner_une_carte(jeu.options(self, tapis))
+        # rien n'est construit si la partie n'est pas détaillée
+        if journal.detaille(logger):
+            logger.info("%s joue %s", self.nom, carte)
         tapis.append((self, carte))
         # pour la surveillance du joueur, signaler un changement
-        self.change()
+        self.change('main')
         # pour la surveillance du tapis, signaler un changement
-        tapis.change()
+        tapis.change('coup', joueur = self, carte = carte)
 
 class JoueurInteractif(Joueur):
     """Joeur qui prend ses décisions de l'extérieur"""
@@ -68,9 +97,84 @@ class JoueurInteractif(Joueur):
 
 class Carte(object):
     """ Une carte à jouer """
-    def __init__(self, couleur, valeur):
+    # pas de __dict__ : une carte est créée une fois par paquet
+    # et partagée par toutes les donnes
+    __slots__ = ('couleur', 'valeur', 'rang', 'bit')
+    def __init__(self, couleur, valeur, rang = None):
         self.couleur = couleur
         self.valeur = valeur
+        # numéro de la carte dans son paquet et bit correspondant
+        # pour représenter un ensemble de cartes par un entier
+        self.rang = rang
+        self.bit = 0 if rang is None else 1 << rang
+
+# pour tester l'appartenance d'une carte sans parcourir la liste
+class Main(list):
+    """ Les cartes d'un joueur, doublées d'un masque de bits """
+    def __init__(self):
+        list.__init__(self)
+        # union des bits des cartes en main
+        self.masque = 0
+
+    def append(self, carte):
+        list.append(self, carte)
+        self.masque |= getattr(carte, 'bit', 0)
+
+    def extend(self, cartes):
+        cartes = list(cartes)
+        list.extend(self, cartes)
+        for carte in cartes:
+            self.masque |= getattr(carte, 'bit', 0)
+
+    def pop(self, index = -1):
+        carte = list.pop(self, index)
+        self.masque &= ~getattr(carte, 'bit', 0)
+        return carte
+
+    def remove(self, carte):
+        list.remove(self, carte)
+        self.masque &= ~getattr(carte, 'bit', 0)
+
+    def insert(self, index, carte):
+        list.insert(self, index, carte)
+        self.masque |= getattr(carte, 'bit', 0)
+
+    def vider(self):
+        """ retire toutes les cartes """
+        del self[:]
+
+    def recalculer(self):
+        """ refait le masque à partir des cartes en main """
+        masque = 0
+        for carte in self:
+            masque |= getattr(carte, 'bit', 0)
+        self.masque = masque
+
+    # les modifications par indice ou par tranche refont le masque
+    def __setitem__(self, index, valeur):
+        list.__setitem__(self, index, valeur)
+        self.recalculer()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.recalculer()
+
+    def __setslice__(self, debut, fin, cartes):
+        list.__setslice__(self, debut, fin, cartes)
+        self.recalculer()
+
+    def __delslice__(self, debut, fin):
+        list.__delslice__(self, debut, fin)
+        self.recalculer()
+
+    def __iadd__(self, cartes):
+        self.extend(cartes)
+        return self
+
+    def __contains__(self, carte):
+        bit = getattr(carte, 'bit', 0)
+        # les objets sans bit (entiers des tests) sont cherchés dans la liste
+        return bool(self.masque & bit) if bit else list.__contains__(self, carte)
 
 # pour pouvoir observer les distributions et les prises de cartes
 class Pioche(list, Observable):
@@ -84,6 +188,12 @@ class Tapis(list, Observable):
     """ L'endroit où jouer les cartes """
     def __init__(self):
         Observable.__init__(self)
+        # la couleur d'atout de la donne en cours, pour les jeux qui en ont
+        self.atout = None
+        # ce que tous les joueurs voient de la donne en cours :
+        # les joueurs dans l'ordre de leurs places et les plis déjà joués
+        self.joueurs = ()
+        self.plis = []
 
 # pour pouvoir voir les points
 class Points(dict, Observable):
@@ -117,10 +227,14 @@ class Table(object):
         """définit les joueurs de la table"""
         self.joueurs = joueurs
 
-    def dedier(self, jeu):
-        """prépare la table à jouer à un jeu donné"""
+    def dedier(self, jeu, graine = None, **conservation):
+        """
+        prépare la table à jouer à un jeu donné
+        conservation : la façon de garder les donnes finies (retention, puits)
+        """
         self.jeu = jeu
-        self.partie = jeu.creer_partie(self.joueurs, self.tapis, self.pioche, self.feuille_de_points)
+        self.partie = jeu.creer_partie(self.joueurs, self.tapis, self.pioche, self.feuille_de_points,
+                                       graine, **conservation)
 
     def jouer(self):
         """ enchaine les parties tant qu'un joueur interactif le souhaite"""
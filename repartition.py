@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Répartition d'un tournoi sur plusieurs machines
+Un coordinateur découpe le tournoi en taches : des tranches de numéros de
+parties (leurs graines, voir tournoi.graines) ou de numéros de donnes
+(voir classement.py). Des ouvriers, sur la même machine ou sur d'autres, lui
+demandent une tache, la jouent et lui renvoient son résumé : points et
+titres de champion par joueur et statistiques (voir statistiques.py), et
+sur demande les points de chaque donne.
+
+Une tache confiée à un ouvrier lui est prêtée pour une durée limitée (bail) :
+si l'ouvrier se déconnecte ou ne rend pas la tache à temps, elle est confiée
+à un autre ; seul l'ouvrier qui la détient peut la rendre. Le coordinateur
+tient un journal : la configuration du tournoi sur la première ligne, puis
+une ligne ajoutée par tache rendue. Relancé avec le même journal, il reprend
+le tournoi là où il en était. Le résultat est le même quel que soit le
+partage des taches : la graine d'une partie se calcule d'après son seul
+numéro (voir tournoi.graine_partie).
+
+Coordinateur et ouvriers échangent des lignes JSON sur une connexion TCP :
+- ouvrier -> coordinateur : {"type": "bonjour", "cle": ...}
+- ouvrier -> coordinateur : {"type": "demander"}
+- coordinateur -> ouvrier : {"type": "tache", "numero": ..., "debut": ..., "fin": ...,
+  "config": {...}}, {"type": "attendre"} ou {"type": "fini"}
+- ouvrier -> coordinateur : {"type": "rendre", "numero": ..., "resume": {...}}
+Un ouvrier se présente d'abord avec la clé partagée du tournoi, sinon la
+connexion est fermée ; coordinateur et ouvrier refusent de démarrer sans clé. Les jeux et les joueurs d'une configuration sont
+désignés par leur nom et ne peuvent être que ceux de JEUX et JOUEURS : un
+ouvrier n'exécute rien d'autre que des parties.
+
+Utilisation :
+    python repartition.py coordinateur journal.txt nb_parties [port [hote]]
+    python repartition.py ouvrier hote port
+la clé partagée est lue dans la variable d'environnement BELOTE_CLE.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import hmac
+import importlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+import SocketServer
+from collections import Counter
+
+import modele as m
+import classement
+from statistiques import Statistiques
+from tournoi import graines, jouer_une_partie
+
+import logging
+logger = logging.getLogger("repartition")
+
+# modes de répartition : par graines de parties ou par numéros de donnes
+GRAINES = 'graines'
+DONNES = 'donnes'
+# durée d'un bail, en secondes
+DUREE_BAIL = 60.0
+# les seules classes qu'une configuration peut désigner
+JEUX = ('jeu.Jeu', 'belote.Belote')
+JOUEURS = ('modele.Joueur', 'ia.JoueurMonteCarlo')
+
+
+def trouver(chemin, permises):
+    """ retourne la classe désignée par 'module.Classe', parmi les permises """
+    if chemin not in permises:
+        raise ValueError("classe non permise : {!r}".format(chemin))
+    module, nom = chemin.rsplit('.', 1)
+    return getattr(importlib.import_module(module), nom)
+
+def verifier(config):
+    """ retourne le jeu et les joueurs (classe, nom) d'une configuration, vérifiés """
+    return trouver(config['jeu'], JEUX), [(trouver(classe, JOUEURS), nom)
+                                          for classe, nom in config['joueurs']]
+
+def jouer_une_donne(numero, classe_jeu, joueurs):
+    """
+    joue la donne de numéro donné (voir classement.py) entre joueurs automatiques
+    retourne son résumé comme tournoi.jouer_une_partie
+    """
+    table = m.Table()
+    table.accueuillir(*[classe(nom) for classe, nom in joueurs])
+    jeu = classe_jeu()
+    # les choix des joueurs dépendent du seul numéro de la donne
+    hasard = random.Random(numero)
+    for joueur in table.joueurs:
+        joueur.rejoindre(hasard)
+    une_donne = classement.donne(numero, jeu, table.joueurs, table.tapis, table.pioche, hasard)
+    une_donne.derouler()
+    meilleur = max(une_donne.scores.values())
+    return {'points': dict((joueur.nom, points) for joueur, points in une_donne.scores.iteritems()),
+            'champions': sorted(joueur.nom for joueur, points in une_donne.scores.iteritems()
+                                if points == meilleur)}
+
+def jouer_tache(config, debut, fin):
+    """ joue les parties ou les donnes de numéros debut à fin et retourne leur résumé """
+    classe_jeu, joueurs = verifier(config)
+    statistiques = Statistiques()
+    points = Counter()
+    champions = Counter()
+    if config['mode'] == GRAINES:
+        resumes = (jouer_une_partie(une_graine, classe_jeu, joueurs)
+                   for une_graine in graines(config['graine'], fin, debut))
+    else:
+        resumes = (jouer_une_donne(config['premier'] + numero, classe_jeu, joueurs)
+                   for numero in xrange(debut, fin))
+    partiels = []
+    for resume in resumes:
+        statistiques.ajouter(resume)
+        points.update(resume['points'])
+        champions.update(resume['champions'])
+        if config.get('partiels'):
+            # une partie a ses partiels, une donne n'a que ses points
+            partiels.extend(resume.get('partiels', [resume['points']]))
+    resume = {'nb_parties': fin - debut, 'points': dict(points), 'champions': dict(champions),
+              'statistiques': statistiques.etat()}
+    if config.get('partiels'):
+        resume['partiels'] = partiels
+    return resume
+
+
+class Dialogue(SocketServer.StreamRequestHandler):
+    """ Échanges du coordinateur avec un ouvrier """
+    def envoyer(self, message):
+        self.wfile.write(json.dumps(message) + '\n')
+        self.wfile.flush()
+
+    def handle(self):
+        coordinateur = self.server
+        try:
+            bonjour = json.loads(self.rfile.readline() or 'null')
+            if not isinstance(bonjour, dict) or not coordinateur.reconnaitre(bonjour.get('cle')):
+                logger.warning("Ouvrier %s refusé : clé inconnue", self.client_address)
+                return
+            for ligne in iter(self.rfile.readline, ''):
+                message = json.loads(ligne)
+                if message['type'] == 'demander':
+                    self.envoyer(coordinateur.attribuer(self))
+                elif message['type'] == 'rendre':
+                    coordinateur.recevoir(message['numero'], message['resume'], self)
+        except (socket.error, ValueError, KeyError, TypeError):
+            logger.warning("Dialogue avec %s interrompu", self.client_address)
+        finally:
+            # ouvrier parti : ses taches en cours sont à confier à d'autres
+            coordinateur.liberer(self)
+
+class Coordinateur(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """ Distribue les taches d'un tournoi et en rassemble les résumés """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, adresse, fichier, config = None, duree_bail = DUREE_BAIL, cle = None):
+        """
+        fichier : le journal du tournoi, repris s'il existe
+        config : mode (GRAINES ou DONNES), nb (de parties ou de donnes),
+        graine ou premier (numéro de donne), taille des taches,
+        jeu ('module.Classe' de JEUX) et joueurs ([('module.Classe' de JOUEURS, nom)...])
+        cle : la clé que les ouvriers doivent présenter, obligatoire
+        """
+        if not cle:
+            # une clé vide accepterait tout client qui connaît le protocole
+            raise ValueError("clé partagée manquante (BELOTE_CLE)")
+        self.fichier = fichier
+        self.duree_bail = duree_bail
+        self.cle = cle.encode('utf-8') if isinstance(cle, unicode) else cle
+        self.verrou = threading.Lock()
+        if os.path.exists(fichier) and os.path.getsize(fichier):
+            self.etat = self.relire()
+            logger.info("Tournoi repris : %d taches faites", len(self.etat['resumes']))
+        else:
+            self.etat = {'config': config, 'resumes': {}}
+        config = self.etat['config']
+        # une configuration refusée l'est avant d'accepter des ouvriers
+        verifier(config)
+        self.journal = open(fichier, 'a')
+        if not self.journal.tell():
+            self.ajouter(config)
+        SocketServer.TCPServer.__init__(self, adresse, Dialogue)
+        self.nb_taches = (config['nb'] + config['taille'] - 1) // config['taille']
+        # numero de tache -> (échéance, dialogue)
+        self.baux = {}
+        self.fini = threading.Event()
+        if len(self.etat['resumes']) == self.nb_taches:
+            self.fini.set()
+
+    def relire(self):
+        """
+        retourne l'état écrit dans le journal : la configuration et les résumés
+        une dernière ligne incomplète (arrêt pendant l'écriture) est effacée
+        """
+        etat = {'config': None, 'resumes': {}}
+        with open(self.fichier, 'r+') as entree:
+            position = 0
+            for ligne in iter(entree.readline, ''):
+                try:
+                    valeur = json.loads(ligne)
+                except ValueError:
+                    logger.warning("Fin du journal incomplète, effacée")
+                    entree.truncate(position)
+                    break
+                if etat['config'] is None:
+                    etat['config'] = valeur
+                else:
+                    etat['resumes'][str(valeur['numero'])] = valeur['resume']
+                position = entree.tell()
+        return etat
+
+    def ajouter(self, valeur):
+        """ ajoute une ligne au journal, écrite sur le disque avant de poursuivre """
+        self.journal.write(json.dumps(valeur) + '\n')
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def reconnaitre(self, cle):
+        """ retourne vrai si la clé présentée par un ouvrier est celle du tournoi """
+        if not isinstance(cle, basestring):
+            return False
+        if isinstance(cle, unicode):
+            cle = cle.encode('utf-8')
+        # comparaison en temps constant, pour ne rien apprendre de la clé
+        return hmac.compare_digest(cle, self.cle)
+
+    def attribuer(self, dialogue):
+        """ retourne le message de la prochaine tache à confier à un ouvrier """
+        config = self.etat['config']
+        maintenant = time.time()
+        with self.verrou:
+            if self.fini.is_set():
+                return {'type': 'fini'}
+            for numero in xrange(self.nb_taches):
+                if str(numero) in self.etat['resumes']:
+                    continue
+                bail = self.baux.get(numero)
+                if bail is None or bail[0] < maintenant:
+                    if bail is not None:
+                        logger.warning("Tache %d reprise à un ouvrier trop lent", numero)
+                    self.baux[numero] = (maintenant + self.duree_bail, dialogue)
+                    debut = numero * config['taille']
+                    return {'type': 'tache', 'numero': numero, 'debut': debut,
+                            'fin': min(debut + config['taille'], config['nb']), 'config': config}
+        # toutes les taches restantes sont prêtées
+        return {'type': 'attendre'}
+
+    def recevoir(self, numero, resume, dialogue):
+        """ retient le résumé d'une tache rendue par l'ouvrier qui la détient """
+        with self.verrou:
+            bail = self.baux.get(numero)
+            if bail is None or bail[1] is not dialogue:
+                # tache jamais prêtée à cet ouvrier, ou reprise par un autre
+                logger.warning("Tache %r rendue par un ouvrier qui ne la détient pas", numero)
+                return
+            del self.baux[numero]
+            if str(numero) in self.etat['resumes']:
+                return
+            self.etat['resumes'][str(numero)] = resume
+            self.ajouter({'numero': numero, 'resume': resume})
+            if len(self.etat['resumes']) == self.nb_taches:
+                self.fini.set()
+
+    def liberer(self, dialogue):
+        """ rend disponibles les taches prêtées à un ouvrier parti """
+        with self.verrou:
+            for numero, (_, detenteur) in self.baux.items():
+                if detenteur is dialogue:
+                    logger.warning("Tache %d abandonnée par un ouvrier", numero)
+                    del self.baux[numero]
+
+    def server_close(self):
+        SocketServer.TCPServer.server_close(self)
+        self.journal.close()
+
+    def resultat(self):
+        """ retourne la fusion des résumés rendus, dans l'ordre des taches """
+        points = Counter()
+        champions = Counter()
+        statistiques = Statistiques()
+        partiels = []
+        nb_parties = 0
+        for numero in sorted(self.etat['resumes'], key = int):
+            resume = self.etat['resumes'][numero]
+            nb_parties = nb_parties + resume['nb_parties']
+            points.update(resume['points'])
+            champions.update(resume['champions'])
+            partiels.extend(resume.get('partiels', []))
+            partielles = Statistiques()
+            partielles.charger(resume['statistiques'])
+            statistiques.fusionner(partielles)
+        resultat = {'nb_parties': nb_parties, 'points': dict(points),
+                    'champions': dict(champions), 'statistiques': statistiques.resume()}
+        if self.etat['config'].get('partiels'):
+            resultat['partiels'] = partiels
+        return resultat
+
+
+class Ouvrier(object):
+    """ Joue les taches confiées par un coordinateur """
+    def __init__(self, adresse, cle, pause = 0.2):
+        if not cle:
+            raise ValueError("clé partagée manquante (BELOTE_CLE)")
+        self.adresse = adresse
+        self.cle = cle
+        # attente avant de redemander quand toutes les taches sont prêtées
+        self.pause = pause
+        self.nb_taches = 0
+
+    def travailler(self):
+        """ joue des taches jusqu'à la fin du tournoi, retourne leur nombre """
+        connexion = socket.create_connection(self.adresse)
+        lecture = connexion.makefile('r')
+        try:
+            connexion.sendall(json.dumps({'type': 'bonjour', 'cle': self.cle}) + '\n')
+            while True:
+                connexion.sendall(json.dumps({'type': 'demander'}) + '\n')
+                ligne = lecture.readline()
+                if not ligne:
+                    break
+                message = json.loads(ligne)
+                if message['type'] == 'fini':
+                    break
+                if message['type'] == 'attendre':
+                    time.sleep(self.pause)
+                    continue
+                resume = jouer_tache(message['config'], message['debut'], message['fin'])
+                connexion.sendall(json.dumps({'type': 'rendre', 'numero': message['numero'],
+                                              'resume': resume}) + '\n')
+                self.nb_taches = self.nb_taches + 1
+        finally:
+            lecture.close()
+            connexion.close()
+        return self.nb_taches
+
+def configuration(nb, graine = 0, taille = 100, jeu = 'jeu.Jeu', joueurs = None,
+                  mode = GRAINES, premier = 0, partiels = False):
+    """
+    retourne la configuration d'un tournoi réparti
+    partiels : rendre aussi les points de chaque donne, dans l'ordre
+    """
+    if joueurs is None:
+        joueurs = [('modele.Joueur', nom) for nom in ("un", "deux", "trois", "quatre")]
+    return {'mode': mode, 'nb': nb, 'graine': graine, 'premier': premier,
+            'taille': taille, 'jeu': jeu, 'joueurs': joueurs, 'partiels': partiels}
+
+
+if __name__=='__main__':
+    import sys
+    import tempfile
+    from multiprocessing import Process
+    from tournoi import tournoi
+    from belote import Belote
+
+    cle = os.environ.get('BELOTE_CLE')
+    def ouvrier(adresse):
+        Ouvrier(adresse, cle).travailler()
+
+    # les taches abandonnées ou reprises sont signalées
+    logging.basicConfig(level = logging.WARNING)
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'coordinateur':
+        # la machine seule par défaut : d'autres hôtes sont à ouvrir explicitement
+        coordinateur = Coordinateur((sys.argv[5] if len(sys.argv) > 5 else '127.0.0.1',
+                                     int(sys.argv[4]) if len(sys.argv) > 4 else 8765),
+                                    sys.argv[2], configuration(int(sys.argv[3])), cle = cle)
+        threading.Thread(target = coordinateur.serve_forever).start()
+        coordinateur.fini.wait()
+        print coordinateur.resultat()
+        coordinateur.shutdown()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'ouvrier':
+        print Ouvrier((sys.argv[2], int(sys.argv[3])), cle).travailler(), "taches jouées"
+    else:
+        print "tests de la répartition"
+        fichier = os.path.join(tempfile.mkdtemp(), 'tournoi.txt')
+        config = configuration(600, graine = 42, taille = 20, jeu = 'belote.Belote',
+                               partiels = True)
+        cle = 'essai'
+        coordinateur = Coordinateur(('127.0.0.1', 0), fichier, config, duree_bail = 5.0, cle = cle)
+        threading.Thread(target = coordinateur.serve_forever).start()
+        # un ouvrier arrêté en plein travail, puis le coordinateur lui-même
+        perdu = Process(target = ouvrier, args = (coordinateur.server_address,))
+        perdu.start()
+        time.sleep(0.5)
+        perdu.terminate()
+        perdu.join()
+        coordinateur.shutdown()
+        coordinateur.server_close()
+        print len(coordinateur.etat['resumes']), "taches faites avant l'arrêt"
+        # le coordinateur relancé reprend avec 3 nouveaux ouvriers
+        coordinateur = Coordinateur(('127.0.0.1', 0), fichier, duree_bail = 5.0, cle = cle)
+        threading.Thread(target = coordinateur.serve_forever).start()
+        # ni un ouvrier sans la clé, ni une tache rendue sans l'avoir reçue
+        intrus = Ouvrier(coordinateur.server_address, 'mauvaise')
+        print "ouvrier sans la clé : ", intrus.travailler(), "tache"
+        connexion = socket.create_connection(coordinateur.server_address)
+        connexion.sendall(json.dumps({'type': 'bonjour', 'cle': cle}) + '\n' +
+                          json.dumps({'type': 'rendre', 'numero': 29, 'resume': {}}) + '\n')
+        connexion.close()
+        ouvriers = [Process(target = ouvrier, args = (coordinateur.server_address,))
+                    for _ in range(3)]
+        for un in ouvriers:
+            un.start()
+        coordinateur.fini.wait()
+        for un in ouvriers:
+            un.join()
+        coordinateur.shutdown()
+        coordinateur.server_close()
+        resultat = coordinateur.resultat()
+        attendu = tournoi(600, graine = 42, nb_processus = 1, classe_jeu = Belote)
+        print "points = ", resultat['points']
+        print len(resultat['partiels']), "donnes identiques au tournoi local = ", \
+              (resultat['partiels'], resultat['points'], resultat['champions'],
+               resultat['nb_parties']) == \
+              (attendu['partiels'], attendu['points'], attendu['champions'], attendu['nb_parties'])
+        config = configuration(200, taille = 50, jeu = 'belote.Belote', mode = DONNES,
+                               premier = classement.nb_donnes() // 2)
+        print "donnes numérotées = ", jouer_tache(config, 0, 50)['points']
+        try:
+            jouer_tache(configuration(1, jeu = 'os.system'), 0, 1)
+        except ValueError as erreur:
+            print "configuration refusée : ", erreur
+        try:
+            Coordinateur(('127.0.0.1', 0), fichier, cle = '')
+        except ValueError as erreur:
+            print "coordinateur refusé : ", erreur
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instantanés des parties en cours
+Un instantané fige l'état d'une partie à n'importe quel moment de son
+déroulement : l'étape de la donne en cours, la pioche, les mains, le tapis,
+les plis, les points et l'état du générateur aléatoire de la partie.
+Restauré dans une partie neuve du même jeu à une table de même nombre de
+joueurs, il lui permet de reprendre exactement là où l'autre en était.
+
+Un instantané est une chaîne d'octets (marshal) :
+- une carte jouée tient en 1 octet : place du joueur * 64 + rang de la carte,
+- une main ou la pioche est la chaîne des rangs de ses cartes, dans leur ordre,
+- les points sont rangés par place de joueur,
+- l'état du générateur aléatoire est compacté en 2,5 ko : celui de la
+  partie, ou à défaut celui du module random qu'elle utilise alors,
+- les mains fixées à l'avance (tableaux numpy de distribution.py compris)
+  sont des listes de rangs.
+Les donnes finies ne sont gardées que résumées (voir jeu.resumer) ;
+rien n'est signalé aux observateurs lors d'une restauration.
+
+Utilisation :
+    instantane = sauvegarde.capturer(une_table.partie)
+    ...
+    une_table.dedier(Belote())
+    sauvegarde.restaurer(instantane, une_table.partie)
+    une_table.partie.reprendre()
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import marshal
+import random
+import struct
+
+from jeu import Donne, FLUX, resumer
+from belote import Contrat
+
+VERSION = 2
+# l'état du Mersenne Twister : 624 mots de 32 bits et une position
+ETAT_HASARD = struct.Struct('<625I')
+# les attributs propres à certains jeux qu'une donne peut avoir
+ATTRIBUTS = ('premier', 'atout', 'mains_initiales', 'gagnants')
+
+
+def coder_coups(coups, places):
+    """ retourne les coups (joueur, carte) sous forme de chaîne, 1 octet par coup """
+    return ''.join([chr(places[joueur] << 6 | carte.rang) for joueur, carte in coups])
+
+def decoder_coups(chaine, joueurs, cartes):
+    """ retourne la liste des coups (joueur, carte) d'une chaîne """
+    return [(joueurs[ord(octet) >> 6], cartes[ord(octet) & 63]) for octet in chaine]
+
+def coder_hasard(hasard):
+    """ retourne l'état d'un générateur aléatoire sous forme compacte """
+    version, mots, gauss = hasard.getstate()
+    return version, ETAT_HASARD.pack(*mots), gauss
+
+def decoder_hasard(hasard, etat):
+    """ remet un générateur aléatoire dans un état codé par coder_hasard """
+    version, mots, gauss = etat
+    hasard.setstate((version, ETAT_HASARD.unpack(mots), gauss))
+
+def capturer(une_partie):
+    """ retourne l'instantané d'une partie """
+    joueurs = une_partie.joueurs
+    places = dict((joueur, siege) for siege, joueur in enumerate(joueurs))
+    une_donne = une_partie.donne_en_cours
+    tapis = une_partie.tapis
+    feuille = une_partie.feuille_de_points
+    hasard = une_partie.hasard
+
+    extras = {}
+    for attribut in ATTRIBUTS:
+        if hasattr(une_donne, attribut):
+            extras[attribut] = getattr(une_donne, attribut)
+    contrat = getattr(une_donne, 'contrat', False)
+    if contrat is not False:
+        extras['contrat'] = tuple(contrat) if contrat is not None else None
+    donne = (une_donne.etape,
+             ''.join([chr(carte.rang) for carte in une_partie.pioche]),
+             [''.join([chr(carte.rang) for carte in joueur.main]) for joueur in joueurs],
+             coder_coups(tapis, places),
+             [coder_coups(pli, places) for pli in une_donne.plis],
+             [(places[joueur], points) for joueur, points in une_donne.scores.iteritems()],
+             # des entiers simples : marshal ne sait pas écrire les tableaux numpy
+             [[int(rang) for rang in main] for main in une_donne.mains]
+             if une_donne.mains is not None else None,
+             # le tapis montre-t-il les plis de la donne (voir belote.py)
+             tapis.plis is une_donne.plis,
+             extras)
+
+    resumes = []
+    if une_partie.retention != FLUX:
+        for finie in une_partie.donnes:
+            if isinstance(finie, Donne):
+                finie = resumer(finie)
+            contrat = finie['contrat']
+            resumes.append(([(places[joueur], points) for joueur, points in finie['scores'].iteritems()],
+                            tuple(contrat) if contrat is not None else None,
+                            finie['nb_plis']))
+    points = ([(places[joueur], total) for joueur, total in feuille.iteritems()],
+              [[(places[joueur], partiel) for joueur, partiel in scores.iteritems()]
+               for scores in feuille.partiels])
+
+    # sans générateur propre, la partie tire ses cartes avec le module random
+    etat_hasard = (hasard is not None, coder_hasard(hasard if hasard is not None else random))
+    return marshal.dumps((VERSION, etat_hasard, une_partie.nb_donnes, points, resumes, donne))
+
+def restaurer(instantane, une_partie):
+    """
+    remet une partie dans l'état d'un instantané
+    la partie doit être créée par le même jeu avec autant de joueurs,
+    une_partie.reprendre() la poursuit ensuite
+    """
+    version, etat_hasard, nb_donnes, points, resumes, donne = marshal.loads(instantane)
+    if version != VERSION:
+        raise ValueError("version d'instantané inconnue : {}".format(version))
+    joueurs = une_partie.joueurs
+    cartes = une_partie.jeu.cartes
+    tapis = une_partie.tapis
+    pioche = une_partie.pioche
+    feuille = une_partie.feuille_de_points
+
+    propre, etat_hasard = etat_hasard
+    if not propre:
+        decoder_hasard(random, etat_hasard)
+    else:
+        if une_partie.hasard is None:
+            une_partie.hasard = random.Random()
+            for joueur in joueurs:
+                joueur.rejoindre(une_partie.hasard)
+        decoder_hasard(une_partie.hasard, etat_hasard)
+
+    une_partie.nb_donnes = nb_donnes
+    totaux, partiels = points
+    feuille.vider()
+    for siege, total in totaux:
+        feuille[joueurs[siege]] = total
+    feuille.partiels = [dict((joueurs[siege], partiel) for siege, partiel in scores)
+                        for scores in partiels]
+    une_partie.donnes = [{'scores': dict((joueurs[siege], score) for siege, score in scores),
+                          'contrat': Contrat(*contrat) if contrat is not None else None,
+                          'nb_plis': nb_plis}
+                         for scores, contrat, nb_plis in resumes]
+
+    etape, chaine_pioche, mains, chaine_tapis, plis, scores, mains_fixees, partage, extras = donne
+    # une donne finie est déjà comptée dans nb_donnes
+    numero = nb_donnes if etape < len(une_partie.jeu.plan_donne) else nb_donnes - 1
+    une_donne = Donne(une_partie.jeu, joueurs, tapis, pioche, une_partie.hasard, mains_fixees,
+                      numero)
+    une_donne.etape = etape
+    une_donne.plis = [decoder_coups(pli, joueurs, cartes) for pli in plis]
+    une_donne.scores = dict((joueurs[siege], score) for siege, score in scores)
+    for attribut, valeur in extras.iteritems():
+        if attribut == 'contrat' and valeur is not None:
+            valeur = Contrat(*valeur)
+        setattr(une_donne, attribut, valeur)
+    une_partie.donne_en_cours = une_donne
+
+    del pioche[:]
+    pioche.extend([cartes[ord(octet)] for octet in chaine_pioche])
+    for joueur, main in zip(joueurs, mains):
+        joueur.main.vider()
+        joueur.main.extend([cartes[ord(octet)] for octet in main])
+    del tapis[:]
+    tapis.extend(decoder_coups(chaine_tapis, joueurs, cartes))
+    tapis.atout = getattr(une_donne, 'atout', None)
+    if partage:
+        tapis.joueurs = joueurs
+        tapis.plis = une_donne.plis
+    else:
+        tapis.joueurs = ()
+        tapis.plis = []
+
+def suivre(une_partie, puits, genre = 'pli'):
+    """
+    passe au puits (une fonction) un instantané de la partie à chaque changement
+    du tapis de ce genre, après chaque pli par défaut
+    retourne la fonction abonnée, pour s'en désabonner
+    """
+    def sauvegarder(evenement):
+        puits(capturer(une_partie))
+    une_partie.tapis.subscribe(sauvegarder, genre)
+    return sauvegarder
+
+
+if __name__=='__main__':
+    import time
+    import random
+    from modele import Table, Joueur
+    from belote import Belote
+    print "tests des instantanés"
+    def table_neuve():
+        une_table = Table()
+        une_table.accueuillir(Joueur("un"), Joueur("deux"), Joueur("trois"), Joueur("quatre"))
+        return une_table
+    # sans graine, la partie utilise le module random
+    for genre, graine in (('pli', 7), ('coup', 7), ('pli', None)):
+        random.seed(7)
+        une_table = table_neuve()
+        une_table.dedier(Belote(), graine)
+        instantanes = []
+        suivre(une_table.partie, instantanes.append, genre)
+        une_table.jouer()
+        attendu = [une_table.feuille_de_points[joueur] for joueur in une_table.joueurs]
+        identiques = 0
+        for instantane in instantanes[::max(1, len(instantanes) // 20)]:
+            autre = table_neuve()
+            autre.dedier(Belote())
+            restaurer(instantane, autre.partie)
+            autre.partie.reprendre()
+            obtenu = [autre.feuille_de_points[joueur] for joueur in autre.joueurs]
+            identiques = identiques + (obtenu == attendu)
+        print "{}, graine {}: {} instantanés, {} octets, {}/{} reprises identiques".format(
+            genre, graine, len(instantanes), len(instantanes[-1]), identiques,
+            len(instantanes[::max(1, len(instantanes) // 20)]))
+    debut = time.time()
+    for _ in range(10000):
+        instantane = capturer(une_table.partie)
+    print "capture : {:.1f} us".format((time.time() - debut) * 100)
+    debut = time.time()
+    for _ in range(10000):
+        restaurer(instantane, autre.partie)
+    print "restauration : {:.1f} us".format((time.time() - debut) * 100)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Serveur de parties en réseau
+Il accueille des joueurs distants et les installe à des tables : une table
+démarre dès que ses places distantes sont prises, les autres places sont
+tenues par des joueurs simulés. Chaque table joue dans son propre fil
+d'exécution : un joueur distant lent ne retarde que sa table.
+Une décision attendue trop longtemps est prise au hasard à sa place, comme
+toutes celles d'un joueur dont la connexion est perdue, y compris celle
+qu'il était en train de prendre : la table continue sans attendre.
+Chaque table et chaque connexion a son fil d'exécution : un serveur tient
+quelques centaines de tables ; au-delà, il faut lancer plusieurs serveurs,
+sur des ports différents, plutôt que d'agrandir un seul.
+
+Le protocole échange des lignes JSON sur une connexion TCP :
+- client -> serveur : {"type": "rejoindre", "nom": ...}
+- serveur -> client : {"type": "place", "table": ..., "siege": ...}
+- serveur -> client : {"type": "choisir", "demande": n, "options": [...],
+                       "tapis": [[nom, rang]...]}
+- client -> serveur : {"type": "choix", "demande": n, "indice": ...}
+  une réponse arrivée après le délai, dont la demande n'est plus attendue,
+  est ignorée
+- serveur -> client : {"type": "fin", "points": {nom: points}, "champions": [noms]}
+  avec "erreur": true si la partie a été interrompue
+Une carte est représentée par son rang dans le paquet (voir jeu.paquet).
+
+Le module fournit aussi un client scripté pour tester le serveur en local.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import json
+import socket
+import threading
+import time
+import Queue
+import SocketServer
+
+import modele as m
+from belote import Belote
+
+import logging
+logger = logging.getLogger("serveur")
+
+
+def coder_option(option):
+    """ retourne une option (carte, contrat ou texte) sous une forme JSON """
+    if isinstance(option, m.Carte):
+        return option.rang
+    if hasattr(option, '_asdict'):
+        return option._asdict()
+    return str(option)
+
+
+class JoueurDistant(m.JoueurInteractif):
+    """ Joueur dont les décisions arrivent par le réseau """
+    def __init__(self, nom, connexion, delai = 60.0):
+        m.JoueurInteractif.__init__(self, nom)
+        self.connexion = connexion
+        # durée maximale d'attente d'une décision, en secondes
+        self.delai = delai
+        # les réponses reçues du client : (numéro de demande, indice),
+        # ou None quand la connexion est perdue
+        self.reponses = Queue.Queue()
+        # numéro de la dernière demande envoyée
+        self.demande = 0
+        self.tapis = None
+
+    def jouer(self, tapis, jeu):
+        self.tapis = tapis
+        m.JoueurInteractif.jouer(self, tapis, jeu)
+
+    def choisir(self, options):
+        """ demande au client son choix et l'attend, au hasard faute de réponse """
+        tapis = [[joueur.nom, carte.rang] for joueur, carte in self.tapis] if self.tapis else []
+        self.demande = self.demande + 1
+        if not self.connexion.envoyer({'type': 'choisir', 'demande': self.demande, 'tapis': tapis,
+                                       'options': [coder_option(option) for option in options]}):
+            return m.Joueur.choisir(self, options)
+        limite = time.time() + self.delai
+        try:
+            while True:
+                reponse = self.reponses.get(timeout = max(0, limite - time.time()))
+                if reponse is None:
+                    # connexion perdue pendant l'attente
+                    return m.Joueur.choisir(self, options)
+                demande, indice = reponse
+                # une réponse en retard à une demande précédente est ignorée
+                if demande == self.demande:
+                    break
+            if 0 <= indice < len(options):
+                return indice
+        except Queue.Empty:
+            logger.warning("%s ne répond pas", self.nom)
+        return m.Joueur.choisir(self, options)
+
+class Connexion(SocketServer.StreamRequestHandler):
+    """ Dialogue avec un client, le temps de sa partie """
+    def setup(self):
+        SocketServer.StreamRequestHandler.setup(self)
+        self.verrou = threading.Lock()
+        self.joueur = None
+        # fausse dès que le client est parti ou injoignable
+        self.ouverte = True
+
+    def envoyer(self, message):
+        """ envoie un message au client, retourne faux si la connexion est perdue """
+        with self.verrou:
+            if not self.ouverte:
+                return False
+            try:
+                self.wfile.write(json.dumps(message) + '\n')
+                self.wfile.flush()
+            except (socket.error, ValueError, AttributeError):
+                # fichier fermé par finish ou client parti
+                self.fermer()
+            return self.ouverte
+
+    def fermer(self):
+        """ note la connexion perdue : les décisions sont prises au hasard sans attendre """
+        if self.ouverte and self.joueur is not None:
+            self.joueur.delai = 0
+            # réveille la décision qui attend peut-être une réponse
+            self.joueur.reponses.put(None)
+        self.ouverte = False
+
+    def handle(self):
+        try:
+            for ligne in iter(self.rfile.readline, ''):
+                message = json.loads(ligne)
+                if message['type'] == 'rejoindre' and self.joueur is None:
+                    self.joueur = JoueurDistant(message['nom'], self, self.server.delai)
+                    self.server.placer(self.joueur)
+                elif message['type'] == 'choix' and self.joueur is not None:
+                    self.joueur.reponses.put((message.get('demande'), int(message['indice'])))
+        except (socket.error, ValueError, KeyError, TypeError):
+            logger.warning("connexion de %s rompue", self.client_address)
+        finally:
+            with self.verrou:
+                self.fermer()
+
+class Serveur(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """ Serveur de tables de jeu pour joueurs distants """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, adresse, nb_distants = 1, classe_jeu = Belote, delai = 60.0):
+        SocketServer.TCPServer.__init__(self, adresse, Connexion)
+        # nombre de places distantes par table, les autres sont simulées
+        self.nb_distants = nb_distants
+        self.classe_jeu = classe_jeu
+        self.delai = delai
+        self.verrou = threading.Lock()
+        self.en_attente = []
+        self.nb_tables = 0
+        self.tables = {}
+
+    def placer(self, joueur):
+        """ installe un joueur distant, démarre sa table quand elle est prête """
+        with self.verrou:
+            self.en_attente.append(joueur)
+            if len(self.en_attente) < self.nb_distants:
+                return
+            distants, self.en_attente = self.en_attente, []
+            numero = self.nb_tables
+            self.nb_tables = self.nb_tables + 1
+        joueurs = distants + [m.Joueur("robot{}".format(siege))
+                              for siege in range(len(distants), 4)]
+        for siege, distant in enumerate(distants):
+            distant.connexion.envoyer({'type': 'place', 'table': numero, 'siege': siege})
+        fil = threading.Thread(target = self.animer, args = (numero, joueurs),
+                               name = "table{}".format(numero))
+        fil.daemon = True
+        self.tables[numero] = fil
+        fil.start()
+
+    def animer(self, numero, joueurs):
+        """ joue une partie à une table puis en donne le résultat aux joueurs distants """
+        fin = {'type': 'fin', 'points': {}, 'champions': []}
+        try:
+            table = m.Table()
+            table.accueuillir(*joueurs)
+            table.dedier(self.classe_jeu(), numero)
+            table.jouer()
+            feuille = table.feuille_de_points
+            fin['points'] = dict((joueur.nom, points) for joueur, points in feuille.iteritems())
+            fin['champions'] = sorted(joueur.nom for joueur in feuille.champions)
+        except Exception:
+            logger.exception("table %d interrompue", numero)
+            fin['erreur'] = True
+        finally:
+            # même interrompue, la table est libérée et ses joueurs prévenus
+            self.tables.pop(numero, None)
+            for joueur in joueurs:
+                if isinstance(joueur, JoueurDistant):
+                    joueur.connexion.envoyer(fin)
+
+
+class ClientScripte(object):
+    """ Client de test qui joue selon une stratégie : options -> indice """
+    def __init__(self, adresse, nom, strategie = None, nb_decisions_max = None):
+        self.adresse = adresse
+        self.nom = nom
+        self.strategie = strategie if strategie is not None else (lambda options: 0)
+        self.nb_decisions = 0
+        # pour tester un client qui part en cours de partie
+        self.nb_decisions_max = nb_decisions_max
+
+    def jouer(self):
+        """ rejoint une table, joue la partie et retourne le message de fin """
+        connexion = socket.create_connection(self.adresse)
+        lecture = connexion.makefile('r')
+        try:
+            connexion.sendall(json.dumps({'type': 'rejoindre', 'nom': self.nom}) + '\n')
+            for ligne in iter(lecture.readline, ''):
+                message = json.loads(ligne)
+                if message['type'] == 'choisir':
+                    if self.nb_decisions == self.nb_decisions_max:
+                        return None
+                    self.nb_decisions = self.nb_decisions + 1
+                    indice = self.strategie(message['options'])
+                    connexion.sendall(json.dumps({'type': 'choix', 'demande': message['demande'],
+                                                  'indice': indice}) + '\n')
+                elif message['type'] == 'fin':
+                    return message
+        finally:
+            lecture.close()
+            connexion.close()
+
+
+if __name__=='__main__':
+    import time
+    print "tests du serveur"
+    logging.basicConfig(level = logging.ERROR)
+    serveur = Serveur(('127.0.0.1', 0), nb_distants = 2)
+    threading.Thread(target = serveur.serve_forever).start()
+    resultats = []
+    def lancer(numero):
+        client = ClientScripte(serveur.server_address, "client{}".format(numero))
+        resultats.append((client.jouer(), client.nb_decisions))
+    debut = time.time()
+    clients = [threading.Thread(target = lancer, args = (numero,)) for numero in range(40)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    print len(resultats), "clients,", serveur.nb_tables, "tables en {:.1f} s".format(time.time() - debut)
+    print resultats[0]
+    # un client part en cours de partie : son partenaire de table la finit
+    resultats = []
+    debut = time.time()
+    parti = threading.Thread(target = lambda: ClientScripte(serveur.server_address, "parti",
+                                                            nb_decisions_max = 3).jouer())
+    parti.start()
+    lancer(40)
+    parti.join()
+    # sa décision en attente est prise au hasard sans attendre le délai
+    print "après un départ : ", resultats[0][0]['champions'], resultats[0][1], "décisions,", \
+          len(serveur.tables), "tables en cours, en {:.1f} s".format(time.time() - debut)
+    serveur.shutdown()
+    serveur.server_close()
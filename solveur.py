@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Solveur à quatre jeux visibles pour la belote
+Il calcule le résultat d'une donne quand chaque joueur joue au mieux
+en connaissant les 4 mains : les points de carte et le 10 de der que fait
+l'équipe des places paires, l'autre équipe faisant le reste.
+La belote, fixée par la distribution, et le capot ne sont pas comptés.
+
+La recherche est un alpha-beta carte par carte, appelé avec des fenêtres
+nulles successives, chacune coupant en deux l'encadrement du résultat.
+Au début de chaque pli, la position est entièrement définie par les cartes
+restant dans chaque main et la place qui entame : ses bornes et sa meilleure
+entame sont rangées dans une table de transpositions de taille bornée, les
+positions les moins récemment utilisées en sortant les premières ; la
+meilleure entame est essayée d'abord quand la position revient. Les autres
+joueurs essaient d'abord de charger le pli de leur partenaire maître, sinon
+de le prendre, sinon d'y donner le moins de points. Le dernier pli, aux
+cartes forcées, est compté sans recherche. Deux cartes d'une main qui se
+suivent dans une couleur, sans carte restante entre elles, et de même valeur
+en points sont équivalentes : une seule est essayée.
+Les mains sont d'abord mises sous forme canonique (voir symetrie.py) : des
+donnes qui ne diffèrent que par un échange de couleurs hors atout partagent
+les positions d'une même table.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from belote import NB_CARTES, NB_COULEURS, NB_VALEURS, DIX_DE_DER, TOTAL, \
+     FORCE, FORCE_PLI, POINTS, couleur, gagnant, valeur, cartes_jouables
+from symetrie import canonique
+
+import logging
+logger = logging.getLogger("solveur")
+
+
+# ENTRE[atout][rang][autre] : bits des cartes de la couleur de rang
+# dont la force est strictement entre celles des 2 cartes
+ENTRE = tuple(
+    tuple(
+        tuple(sum(1 << carte for carte in range(NB_CARTES)
+                  if couleur(carte) == couleur(rang)
+                  and min(FORCE[atout][rang], FORCE[atout][autre]) < FORCE[atout][carte]
+                  < max(FORCE[atout][rang], FORCE[atout][autre]))
+              for autre in range(NB_CARTES))
+        for rang in range(NB_CARTES))
+    for atout in range(NB_COULEURS))
+
+
+class TableTranspositions(object):
+    """
+    Bornes et meilleure entame des positions déjà cherchées, en nombre limité :
+    deux générations de dictionnaires, la plus ancienne étant abandonnée en bloc
+    quand la récente est pleine ; une position relue y est ramenée
+    """
+    def __init__(self, taille_max = 1000000):
+        self.taille_max = taille_max
+        self.recentes = {}
+        self.anciennes = {}
+        self.trouvees = 0
+        self.cherchees = 0
+
+    def __len__(self):
+        return len(self.recentes) + len(self.anciennes)
+
+    def lire(self, cle):
+        self.cherchees = self.cherchees + 1
+        bornes = self.recentes.get(cle)
+        if bornes is None:
+            bornes = self.anciennes.pop(cle, None)
+            if bornes is None:
+                return None
+            self.ecrire(cle, bornes)
+        self.trouvees = self.trouvees + 1
+        return bornes
+
+    def ecrire(self, cle, bornes):
+        recentes = self.recentes
+        if cle not in recentes and len(recentes) >= self.taille_max // 2:
+            # les positions les moins récemment utilisées laissent leur place
+            self.anciennes = recentes
+            self.recentes = recentes = {}
+        recentes[cle] = bornes
+
+    def vider(self):
+        self.recentes = {}
+        self.anciennes = {}
+
+def cle(mains, premier, atout):
+    """
+    retourne la clé d'une position : les 4 masques, la place qui entame et l'atout
+    pour qu'une table puisse servir à plusieurs donnes
+    """
+    return mains[0] | mains[1] << 32 | mains[2] << 64 | mains[3] << 96 \
+           | premier << 128 | atout << 130
+
+
+class Solveur(object):
+    """ Recherche alpha-beta du résultat d'une donne à jeux visibles """
+    def __init__(self, atout, table = None):
+        self.atout = atout
+        self.table = table if table is not None else TableTranspositions()
+        self.noeuds = 0
+
+    def resoudre(self, mains, premier = 0):
+        """ retourne les points que fait l'équipe des places paires """
+        # le résultat ne dépend pas des couleurs hors atout échangées
+        mains = list(canonique(mains, self.atout)[0])
+        restant = sum(valeur(self.rangs(main), self.atout) for main in mains) + DIX_DE_DER
+        # encadrement du résultat coupé en deux par chaque recherche à fenêtre nulle
+        basse, haute = 0, restant
+        while basse < haute:
+            seuil = (basse + haute + 1) // 2
+            resultat = self.chercher(mains, premier, restant, seuil - 1, seuil)
+            if resultat < seuil:
+                haute = resultat
+            else:
+                basse = resultat
+        return basse
+
+    @staticmethod
+    def rangs(masque):
+        """ retourne les rangs des cartes d'un masque """
+        rangs = []
+        while masque:
+            bit = masque & -masque
+            rangs.append(bit.bit_length() - 1)
+            masque ^= bit
+        return rangs
+
+    def coups(self, jouables, autres):
+        """
+        retourne les rangs des cartes jouables, des plus fortes aux plus faibles,
+        sans celles équivalentes à une carte déjà retenue
+        autres : les cartes des autres mains et du pli
+        """
+        atout = self.atout
+        entre = ENTRE[atout]
+        points = POINTS[atout]
+        coups = []
+        # dernière carte retenue dans chaque couleur
+        precedents = [None] * NB_COULEURS
+        for rang in sorted(self.rangs(jouables), key = FORCE[atout].__getitem__, reverse = True):
+            precedent = precedents[rang // NB_VALEURS]
+            if precedent is not None and points[rang] == points[precedent] \
+               and not entre[precedent][rang] & autres:
+                continue
+            precedents[rang // NB_VALEURS] = rang
+            coups.append(rang)
+        return coups
+
+    def chercher(self, mains, premier, restant, alpha, beta):
+        """
+        valeur de la position au début d'un pli, bornée par alpha et beta
+        restant : les points encore à faire, 10 de der compris
+        """
+        if alpha >= restant:
+            return restant
+        if beta <= 0:
+            return 0
+        atout = self.atout
+        if not mains[premier] & (mains[premier] - 1):
+            # dernier pli : les cartes sont forcées, il rapporte tout ce qui reste
+            rangs = [mains[(premier + ordre) % 4].bit_length() - 1 for ordre in range(4)]
+            return restant if (premier + gagnant(rangs, atout)) % 2 == 0 else 0
+        position = cle(mains, premier, atout)
+        bornes = self.table.lire(position)
+        if bornes is not None:
+            basse, haute, entame = bornes
+            if basse >= beta:
+                return basse
+            if haute <= alpha:
+                return haute
+            if basse > alpha:
+                alpha = basse
+            if haute < beta:
+                beta = haute
+        else:
+            basse, haute, entame = 0, restant, None
+        resultat, entame = self.entamer(mains, premier, restant, alpha, beta, entame)
+        if resultat <= alpha:
+            haute = resultat
+        elif resultat >= beta:
+            basse = resultat
+        else:
+            basse = haute = resultat
+        self.table.ecrire(position, (basse, haute, entame))
+        return resultat
+
+    def entamer(self, mains, premier, restant, alpha, beta, entame):
+        """
+        retourne (valeur, meilleure entame) de la position au début d'un pli,
+        en essayant d'abord l'entame qui était la meilleure à la dernière recherche
+        """
+        self.noeuds = self.noeuds + 1
+        main = mains[premier]
+        coups = self.coups(main, (mains[0] | mains[1] | mains[2] | mains[3]) & ~main)
+        if entame is not None:
+            coups.remove(entame)
+            coups.insert(0, entame)
+        maximiser = premier % 2 == 0
+        meilleur = -1 if maximiser else TOTAL + 1
+        for rang in coups:
+            mains[premier] = main & ~(1 << rang)
+            resultat = self.poser(mains, premier, restant, [rang], alpha, beta)
+            if maximiser:
+                if resultat > meilleur:
+                    meilleur, entame = resultat, rang
+                    if meilleur > alpha:
+                        alpha = meilleur
+            else:
+                if resultat < meilleur:
+                    meilleur, entame = resultat, rang
+                    if meilleur < beta:
+                        beta = meilleur
+            if alpha >= beta:
+                break
+        mains[premier] = main
+        return meilleur, entame
+
+    def poser(self, mains, premier, restant, rangs, alpha, beta):
+        """ valeur du pli entamé, carte par carte, puis de la suite """
+        self.noeuds = self.noeuds + 1
+        atout = self.atout
+        points = POINTS[atout]
+        siege = (premier + len(rangs)) % 4
+        main = mains[siege]
+        autres = (mains[0] | mains[1] | mains[2] | mains[3]) & ~main
+        for autre in rangs:
+            autres |= 1 << autre
+        coups = self.coups(cartes_jouables(main, rangs, atout), autres)
+        if len(coups) > 1:
+            indice = gagnant(rangs, atout)
+            if len(rangs) - indice == 2:
+                # le partenaire est maître : charger le pli
+                coups.sort(key = points.__getitem__, reverse = True)
+            else:
+                # prendre le pli, les plus fortes d'abord, sinon donner le moins de points
+                forces = FORCE_PLI[atout][rangs[0] // NB_VALEURS]
+                maitre = forces[rangs[indice]]
+                perdantes = [rang for rang in coups if forces[rang] < maitre]
+                if perdantes:
+                    perdantes.sort(key = points.__getitem__)
+                    coups = [rang for rang in coups if forces[rang] > maitre] + perdantes
+
+        maximiser = siege % 2 == 0
+        meilleur = -1 if maximiser else TOTAL + 1
+        for rang in coups:
+            mains[siege] = main & ~(1 << rang)
+            rangs.append(rang)
+            if len(rangs) == 4:
+                # pli complet : son gagnant entame le suivant
+                suivant = (premier + gagnant(rangs, atout)) % 4
+                pli = points[rangs[0]] + points[rangs[1]] + points[rangs[2]] + points[rang]
+                gain = pli if suivant % 2 == 0 else 0
+                resultat = gain + self.chercher(mains, suivant, restant - pli,
+                                                alpha - gain, beta - gain)
+            else:
+                resultat = self.poser(mains, premier, restant, rangs, alpha, beta)
+            rangs.pop()
+            if maximiser:
+                if resultat > meilleur:
+                    meilleur = resultat
+                    if meilleur > alpha:
+                        alpha = meilleur
+            else:
+                if resultat < meilleur:
+                    meilleur = resultat
+                    if meilleur < beta:
+                        beta = meilleur
+            if alpha >= beta:
+                break
+        mains[siege] = main
+        return meilleur
+
+def resoudre_donne(une_donne, table = None):
+    """
+    retourne les points que font les 2 équipes d'une donne de belote jouée au mieux
+    à partir des mains distribuées
+    """
+    solveur = Solveur(une_donne.atout, table)
+    pairs = solveur.resoudre(une_donne.mains_initiales, une_donne.premier)
+    return [pairs, TOTAL - pairs]
+
+
+if __name__=='__main__':
+    import random
+    import time
+    print "tests du solveur"
+    hasard = random.Random(1)
+    for essai in range(5):
+        cartes = range(NB_CARTES)
+        hasard.shuffle(cartes)
+        mains = [sum(1 << rang for rang in cartes[siege * 8:siege * 8 + 8]) for siege in range(4)]
+        solveur = Solveur(hasard.randrange(4))
+        debut = time.time()
+        pairs = solveur.resoudre(mains)
+        print "points = {:>3} / {:>3}  noeuds = {:>7}  {:.3f} s".format(
+            pairs, TOTAL - pairs, solveur.noeuds, time.time() - debut)
+    # les fins de donne, à 4 cartes par main, se résolvent en quelques millisecondes
+    durees = []
+    for essai in range(20):
+        cartes = range(NB_CARTES)
+        hasard.shuffle(cartes)
+        mains = [sum(1 << rang for rang in cartes[siege * 4:siege * 4 + 4]) for siege in range(4)]
+        solveur = Solveur(hasard.randrange(4))
+        debut = time.time()
+        solveur.resoudre(mains)
+        durees.append(time.time() - debut)
+    print "fins de donne à 4 cartes : {:.1f} ms en moyenne".format(1000 * sum(durees) / len(durees))
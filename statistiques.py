@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Statistiques des parties au fil de l'eau
+Les résultats des parties s'ajoutent un par un, en mémoire constante :
+pour chaque joueur, la moyenne et la variance de ses points et de ses
+victoires sont tenues à jour par l'algorithme de Welford, sans garder
+les résultats eux-mêmes. Un intervalle de confiance (loi normale) en est
+déduit, pour arrêter une expérience dès qu'il est assez étroit.
+
+Utilisation :
+    stats = Statistiques()
+    for resume in resumes:          # voir tournoi.jouer_une_partie
+        stats.ajouter(resume)
+    stats.victoires['un'].intervalle()
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+import math
+
+# quantiles de la loi normale pour les niveaux de confiance usuels
+QUANTILES = {0.90: 1.645, 0.95: 1.960, 0.99: 2.576}
+
+
+class Moyenne(object):
+    """ Moyenne et variance d'une suite de valeurs, en mémoire constante """
+    def __init__(self):
+        self.n = 0
+        self.moyenne = 0.0
+        # somme des carrés des écarts à la moyenne
+        self.m2 = 0.0
+
+    def ajouter(self, valeur):
+        self.n = self.n + 1
+        ecart = valeur - self.moyenne
+        self.moyenne = self.moyenne + ecart / self.n
+        self.m2 = self.m2 + ecart * (valeur - self.moyenne)
+
+    def fusionner(self, autre):
+        """ ajoute les valeurs d'une autre moyenne, tenue à part (autre processus) """
+        n = self.n + autre.n
+        if not n:
+            return
+        ecart = autre.moyenne - self.moyenne
+        self.moyenne = self.moyenne + ecart * autre.n / n
+        self.m2 = self.m2 + autre.m2 + ecart * ecart * self.n * autre.n / n
+        self.n = n
+
+    def etat(self):
+        """ retourne [n, moyenne, m2], pour transmettre ou enregistrer la moyenne """
+        return [self.n, self.moyenne, self.m2]
+
+    def charger(self, etat):
+        """ reprend un état retourné par etat() """
+        self.n, self.moyenne, self.m2 = etat
+
+    def variance(self):
+        """ variance de l'échantillon (estimation sans biais) """
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def demi_largeur(self, confiance = 0.95):
+        """ demi-largeur de l'intervalle de confiance de la moyenne """
+        if self.n < 2:
+            return float('inf')
+        return QUANTILES[confiance] * math.sqrt(self.variance() / self.n)
+
+    def intervalle(self, confiance = 0.95):
+        """ retourne (borne basse, borne haute) de l'intervalle de confiance de la moyenne """
+        demi = self.demi_largeur(confiance)
+        return self.moyenne - demi, self.moyenne + demi
+
+    def __repr__(self):
+        return "{:.3f} +- {:.3f} (n = {})".format(self.moyenne, self.demi_largeur(), self.n)
+
+
+class Statistiques(object):
+    """ Points et victoires par joueur, au fil des parties """
+    def __init__(self):
+        self.nb_parties = 0
+        self.points = {}
+        self.victoires = {}
+
+    def ajouter(self, resume):
+        """ ajoute le résumé d'une partie : points par nom de joueur et champions """
+        self.nb_parties = self.nb_parties + 1
+        champions = resume['champions']
+        for nom, points in resume['points'].iteritems():
+            if nom not in self.points:
+                self.points[nom] = Moyenne()
+                self.victoires[nom] = Moyenne()
+            self.points[nom].ajouter(points)
+            self.victoires[nom].ajouter(1.0 if nom in champions else 0.0)
+
+    def fusionner(self, autres):
+        """ ajoute les statistiques tenues à part """
+        self.nb_parties = self.nb_parties + autres.nb_parties
+        for nom in autres.points:
+            if nom not in self.points:
+                self.points[nom] = Moyenne()
+                self.victoires[nom] = Moyenne()
+            self.points[nom].fusionner(autres.points[nom])
+            self.victoires[nom].fusionner(autres.victoires[nom])
+
+    def etat(self):
+        """ retourne les statistiques sous une forme simple (JSON, marshal) """
+        return {'nb_parties': self.nb_parties,
+                'points': dict((nom, moyenne.etat()) for nom, moyenne in self.points.iteritems()),
+                'victoires': dict((nom, moyenne.etat())
+                                  for nom, moyenne in self.victoires.iteritems())}
+
+    def charger(self, etat):
+        """ reprend un état retourné par etat() """
+        self.nb_parties = etat['nb_parties']
+        for genre in ('points', 'victoires'):
+            moyennes = getattr(self, genre)
+            moyennes.clear()
+            for nom, valeurs in etat[genre].iteritems():
+                moyennes[nom] = Moyenne()
+                moyennes[nom].charger(valeurs)
+
+    def mesure(self, critere):
+        """ retourne la Moyenne désignée par critere : ('points' ou 'victoires', nom) """
+        genre, nom = critere
+        return getattr(self, genre).get(nom)
+
+    def resume(self, confiance = 0.95):
+        """ retourne les statistiques par nom de joueur : (moyenne, demi-largeur) """
+        return {'nb_parties': self.nb_parties,
+                'points': dict((nom, (moyenne.moyenne, moyenne.demi_largeur(confiance)))
+                               for nom, moyenne in self.points.iteritems()),
+                'victoires': dict((nom, (moyenne.moyenne, moyenne.demi_largeur(confiance)))
+                                  for nom, moyenne in self.victoires.iteritems())}
+
+    def texte(self, confiance = 0.95):
+        """ retourne un tableau des statistiques par joueur """
+        lignes = ["{} parties, intervalles à {:.0%}".format(self.nb_parties, confiance),
+                  "{:<12} {:>20} {:>20}".format("joueur", "points", "victoires")]
+        for nom in sorted(self.points):
+            points = self.points[nom]
+            victoires = self.victoires[nom]
+            lignes.append("{:<12} {:>11.1f} +- {:>5.1f} {:>10.1%} +- {:>5.1%}".format(
+                nom, points.moyenne, points.demi_largeur(confiance),
+                victoires.moyenne, victoires.demi_largeur(confiance)))
+        return '\n'.join(lignes)
+
+
+if __name__=='__main__':
+    import random
+    print "tests des statistiques"
+    hasard = random.Random(3)
+    valeurs = [hasard.gauss(10, 2) for _ in range(10000)]
+    une, deux, tout = Moyenne(), Moyenne(), Moyenne()
+    for valeur in valeurs[:3000]:
+        une.ajouter(valeur)
+    for valeur in valeurs[3000:]:
+        deux.ajouter(valeur)
+    for valeur in valeurs:
+        tout.ajouter(valeur)
+    une.fusionner(deux)
+    moyenne = sum(valeurs) / len(valeurs)
+    variance = sum((valeur - moyenne) ** 2 for valeur in valeurs) / (len(valeurs) - 1)
+    print "moyenne = ", tout, "fusion = ", une
+    print "écarts = ", abs(tout.moyenne - moyenne), abs(tout.variance() - variance), \
+          abs(une.variance() - variance)
@@ -2,11 +2,17 @@
 # -*- coding: utf-8 -*-
 """
 Outils de support pour un jeu de cartes
-Il dfinit des classes pour mettre en oeuvre le patron observateur-observable
+Il définit des classes pour mettre en oeuvre le patron observateur-observable
+Un observateur s'abonne à tous les changements ou à un genre de changement.
+Un changement sans abonné ne coûte rien : aucun événement n'est créé.
+Les changements peuvent être regroupés le temps d'un bloc with :
+un seul événement par genre, le dernier, est alors signalé à la fin du bloc.
 Copyrigth electron-libre de de www.fun-mooc.fr
 Licence CeCill v2
 novembre 2016
 """
+from contextlib import contextmanager
+from collections import OrderedDict
 
 # classe pour le patron observateur-observable
 class Event(object):
@@ -14,13 +20,81 @@ class Event(object):
 
 class Observable(object):
     def __init__(self):
+        # abonnés à tous les changements
         self.callbacks = []
-    def subscribe(self, callback):
-        self.callbacks.append(callback)
-    def change(self, **attrs):
+        # abonnés à un genre de changement, par genre
+        self.abonnements = {}
+        # profondeur des regroupements en cours et changements retenus
+        self.regroupement = 0
+        self.en_attente = None
+
+    def subscribe(self, callback, genre = None):
+        if genre is None:
+            self.callbacks.append(callback)
+        else:
+            self.abonnements.setdefault(genre, []).append(callback)
+
+    def unsubscribe(self, callback, genre = None):
+        if genre is None:
+            self.callbacks.remove(callback)
+        else:
+            self.abonnements[genre].remove(callback)
+            if not self.abonnements[genre]:
+                del self.abonnements[genre]
+
+    def change(self, genre = None, **attrs):
+        # sans abonné, rien n'est créé ni appelé
+        if not self.callbacks and not self.abonnements:
+            return
+        if self.regroupement:
+            # seul le dernier changement de chaque genre sera signalé
+            self.en_attente[genre] = attrs
+        else:
+            self.signaler(genre, attrs)
+
+    def signaler(self, genre, attrs):
+        """ appelle les abonnés concernés avec un événement """
+        abonnes = self.abonnements.get(genre)
+        if not self.callbacks and not abonnes:
+            return
         e = Event()
+        e.__dict__.update(attrs)
         e.source = self
-        for k, v in attrs.iteritems():
-            setattr(e, k, v)
+        e.genre = genre
         for fn in self.callbacks:
-            fn(e)    
\ No newline at end of file
+            fn(e)
+        if abonnes:
+            for fn in abonnes:
+                fn(e)
+
+    def commencer_regroupement(self):
+        if not self.regroupement:
+            self.en_attente = OrderedDict()
+        self.regroupement = self.regroupement + 1
+
+    def finir_regroupement(self):
+        self.regroupement = self.regroupement - 1
+        if not self.regroupement:
+            en_attente, self.en_attente = self.en_attente, None
+            for genre, attrs in en_attente.iteritems():
+                self.signaler(genre, attrs)
+
+    @contextmanager
+    def regrouper(self):
+        """ regroupe les changements signalés pendant un bloc with """
+        self.commencer_regroupement()
+        try:
+            yield self
+        finally:
+            self.finir_regroupement()
+
+@contextmanager
+def regrouper(*observables):
+    """ regroupe les changements de plusieurs observables pendant un bloc with """
+    for observable in observables:
+        observable.commencer_regroupement()
+    try:
+        yield observables
+    finally:
+        for observable in observables:
+            observable.finir_regroupement()
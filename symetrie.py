@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Symétrie des couleurs
+Échanger deux couleurs hors atout dans toutes les mains ne change rien au
+déroulement d'une donne : les 2 états sont équivalents et ont le même
+résultat. Avant les enchères, les 4 couleurs sont ainsi interchangeables.
+Un état est ici une suite de masques de cartes (voir Carte.bit), dans le
+paquet de 32 cartes : les mains, et au besoin un masque par carte du pli en
+cours. Sa forme canonique est le représentant choisi parmi les états
+équivalents, avec la permutation des couleurs qui y mène :
+permutation[couleur] est la couleur qui la remplace.
+Les résultats calculés sur la forme canonique se ramènent à l'état
+d'origine par la permutation inverse (voir restituer).
+
+Utilisation :
+    canoniques, permutation = canonique(mains, atout)
+    ... carte = meilleure carte pour canoniques ...
+    carte = restituer(carte, permutation)
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+NB_COULEURS = 4
+NB_VALEURS = 8
+COULEUR = (1 << NB_VALEURS) - 1
+IDENTITE = (0, 1, 2, 3)
+
+
+def permuter(masque, permutation):
+    """ retourne le masque dont les cartes de chaque couleur passent à permutation[couleur] """
+    resultat = 0
+    for une, autre in enumerate(permutation):
+        resultat |= ((masque >> (une * NB_VALEURS)) & COULEUR) << (autre * NB_VALEURS)
+    return resultat
+
+def permuter_rang(rang, permutation):
+    """ retourne le rang d'une carte après permutation des couleurs """
+    return permutation[rang // NB_VALEURS] * NB_VALEURS + rang % NB_VALEURS
+
+def inverse(permutation):
+    """ retourne la permutation qui défait permutation """
+    resultat = [0] * NB_COULEURS
+    for une, autre in enumerate(permutation):
+        resultat[autre] = une
+    return tuple(resultat)
+
+def restituer(rang, permutation):
+    """ ramène le rang d'une carte de la forme canonique à l'état d'origine """
+    return permuter_rang(rang, inverse(permutation))
+
+def canonique(masques, atout = None):
+    """
+    retourne (masques canoniques, permutation) d'un état
+    l'atout garde sa couleur, les autres couleurs sont rangées par ordre
+    décroissant de leurs cartes dans les masques successifs ;
+    sans atout, les 4 couleurs sont rangées
+    """
+    # la signature d'une couleur : ses cartes dans chaque masque
+    signatures = [(tuple([(masque >> (une * NB_VALEURS)) & COULEUR for masque in masques]), une)
+                  for une in range(NB_COULEURS) if une != atout]
+    signatures.sort(reverse = True)
+    places = [une for une in range(NB_COULEURS) if une != atout]
+    permutation = [0] * NB_COULEURS
+    if atout is not None:
+        permutation[atout] = atout
+    for place, (_, une) in zip(places, signatures):
+        permutation[une] = place
+    permutation = tuple(permutation)
+    if permutation == IDENTITE:
+        return tuple(masques), permutation
+    return tuple([permuter(masque, permutation) for masque in masques]), permutation
+
+def nb_equivalents(masques, atout = None):
+    """ retourne le nombre d'états distincts équivalents à celui-ci """
+    # les couleurs de même signature s'échangent sans rien changer
+    signatures = {}
+    for une in range(NB_COULEURS):
+        if une != atout:
+            signature = tuple([(masque >> (une * NB_VALEURS)) & COULEUR for masque in masques])
+            signatures[signature] = signatures.get(signature, 0) + 1
+    nombre = 1
+    for rang in range(2, NB_COULEURS - (atout is not None) + 1):
+        nombre = nombre * rang
+    for repetitions in signatures.itervalues():
+        for rang in range(2, repetitions + 1):
+            nombre = nombre // rang
+    return nombre
+
+
+if __name__=='__main__':
+    import itertools
+    import random
+    print "tests de la symétrie des couleurs"
+    hasard = random.Random(2)
+    for essai in range(1000):
+        cartes = range(32)
+        hasard.shuffle(cartes)
+        mains = [sum(1 << rang for rang in cartes[siege * 8:siege * 8 + 8]) for siege in range(4)]
+        atout = hasard.choice((None, 0, 1, 2, 3))
+        forme, permutation = canonique(mains, atout)
+        # tous les états équivalents ont la même forme canonique
+        autres = [une for une in itertools.permutations(range(4))
+                  if atout is None or une[atout] == atout]
+        une = hasard.choice(autres)
+        assert canonique([permuter(main, une) for main in mains], atout)[0] == forme
+        assert [permuter(main, inverse(permutation)) for main in forme] == mains
+        assert all(restituer(permuter_rang(rang, permutation), permutation) == rang
+                   for rang in range(32))
+        assert len(set(tuple(permuter(main, une) for main in mains) for une in autres)) \
+               == nb_equivalents(mains, atout)
+    print "1000 états vérifiés"
+    # des mains de 5 cartes et leurs formes canoniques, sans atout
+    formes = set()
+    for essai in range(20000):
+        main = sum(1 << rang for rang in hasard.sample(range(32), 5))
+        formes.add(canonique([main])[0])
+    print "20000 mains de 5 cartes tirées,", len(formes), "formes canoniques"
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tournoi de parties de cartes réparties sur plusieurs processus
+Chaque partie reçoit sa propre graine, calculée à partir d'une graine
+maîtresse et de son seul numéro : le résultat d'un tournoi ne dépend donc
+pas du nombre de processus, ni de machines (voir repartition.py).
+Les parties se jouent sans vue, entre joueurs automatiques.
+
+Son interface est :
+- la fonction tournoi() qui joue les parties et fusionne leurs points,
+- la fonction jouer_une_partie() qui joue une seule partie d'après sa graine.
+Les statistiques des joueurs (voir statistiques.py) sont tenues au fil des
+parties ; un tournoi peut s'arrêter dès qu'elles sont assez précises.
+Les jeux et les joueurs sont passés par leur classe pour pouvoir
+être recréés dans chaque processus.
+
+Copyrigth electron-libre de de www.fun-mooc.fr
+Licence CeCill v2
+"""
+from multiprocessing import Pool, cpu_count
+from collections import Counter
+from itertools import imap
+import hashlib
+import struct
+
+import modele as m
+from jeu import Jeu
+from statistiques import Statistiques
+
+import logging
+logger = logging.getLogger("tournoi")
+
+# joueurs par défaut d'une table de tournoi
+JOUEURS = ((m.Joueur, "un"), (m.Joueur, "deux"), (m.Joueur, "trois"), (m.Joueur, "quatre"))
+# nombre de parties avant de se fier à un intervalle de confiance
+NB_MIN_PARTIES = 100
+# taille maximale des paquets de taches quand le tournoi peut s'arrêter tôt
+PAQUET_MAX = 64
+
+
+def graine_partie(graine, numero):
+    """ retourne la graine de la partie de ce numéro, sur 63 bits """
+    # une empreinte et non un tirage : chaque graine se calcule sans les précédentes
+    empreinte = hashlib.sha1('{}:{}'.format(graine, numero)).digest()
+    return struct.unpack('<Q', empreinte[:8])[0] >> 1
+
+def graines(graine, nb_parties, debut = 0):
+    """ retourne les graines indépendantes des parties de numéros debut à nb_parties """
+    return [graine_partie(graine, numero) for numero in xrange(debut, nb_parties)]
+
+def jouer_une_partie(graine, classe_jeu = Jeu, joueurs = JOUEURS):
+    """
+    joue une partie complète d'après sa graine
+    retourne son résumé par nom de joueur : points, partiels et champions
+    """
+    table = m.Table()
+    table.accueuillir(*[classe(nom) for classe, nom in joueurs])
+    table.dedier(classe_jeu(), graine)
+    table.jouer()
+    feuille = table.feuille_de_points
+    return {
+        'points': dict((joueur.nom, points) for joueur, points in feuille.iteritems()),
+        'partiels': [dict((joueur.nom, points) for joueur, points in partiel.iteritems())
+                     for partiel in feuille.partiels],
+        'champions': sorted(joueur.nom for joueur in feuille.champions),
+    }
+
+def _jouer(tache):
+    """ point d'entrée des processus : une tache est (graine, classe_jeu, joueurs) """
+    return jouer_une_partie(*tache)
+
+def fusionner(resumes, avec_partiels = True):
+    """
+    fusionne les résumés des parties, dans l'ordre des parties
+    les points sont additionnés, les partiels mis bout à bout (si demandé)
+    et les titres de champion comptés par joueur
+    """
+    nb_parties = 0
+    points = Counter()
+    partiels = []
+    champions = Counter()
+    for resume in resumes:
+        nb_parties = nb_parties + 1
+        points.update(resume['points'])
+        if avec_partiels:
+            partiels.extend(resume['partiels'])
+        champions.update(resume['champions'])
+    return {'nb_parties': nb_parties, 'points': dict(points),
+            'partiels': partiels, 'champions': dict(champions)}
+
+def tournoi(nb_parties, graine = 0, nb_processus = None, classe_jeu = Jeu, joueurs = JOUEURS,
+            precision = None, critere = None, avec_partiels = True):
+    """
+    joue nb_parties réparties sur nb_processus (tous les coeurs par défaut)
+    retourne la fusion de leurs résultats et leurs statistiques,
+    identiques quel que soit nb_processus
+    avec une precision, le tournoi s'arrête dès que l'intervalle de confiance
+    à 95 % du critere ('victoires' ou 'points', nom d'un joueur) a une
+    demi-largeur d'au plus precision : nb_parties n'est plus qu'un maximum
+    par défaut, le critère est le taux de victoires du premier joueur
+    sans partiels, la mémoire ne croît pas avec le nombre de parties
+    """
+    taches = [(une_graine, classe_jeu, joueurs) for une_graine in graines(graine, nb_parties)]
+    critere = critere or ('victoires', joueurs[0][1])
+    statistiques = Statistiques()
+    nb_processus = nb_processus or cpu_count()
+    logger.info("Tournoi de %d parties sur %d processus", nb_parties, nb_processus)
+
+    def suivre(resumes):
+        """ tient les statistiques à jour et arrête les parties si elles suffisent """
+        for resume in resumes:
+            statistiques.ajouter(resume)
+            yield resume
+            if precision is not None and statistiques.nb_parties >= NB_MIN_PARTIES \
+               and statistiques.mesure(critere).demi_largeur() <= precision:
+                logger.info("Tournoi arrêté après %d parties", statistiques.nb_parties)
+                return
+
+    if nb_processus == 1:
+        resultat = fusionner(suivre(imap(_jouer, taches)), avec_partiels)
+    else:
+        pool = Pool(nb_processus)
+        try:
+            # des paquets de taches pour limiter les échanges entre processus,
+            # plus petits si le tournoi peut s'arrêter avant la fin
+            paquet = max(1, nb_parties // (4 * nb_processus))
+            if precision is not None:
+                paquet = min(paquet, PAQUET_MAX)
+            # les résultats arrivent dans l'ordre des parties
+            resultat = fusionner(suivre(pool.imap(_jouer, taches, paquet)), avec_partiels)
+        finally:
+            # les parties encore en cours sont abandonnées
+            pool.terminate()
+            pool.join()
+    resultat['statistiques'] = statistiques.resume()
+    return resultat
+
+
+if __name__=='__main__':
+    import time
+    print "tests du tournoi"
+    resultats = {}
+    for nb_processus in (1, 2, cpu_count()):
+        debut = time.time()
+        resultats[nb_processus] = tournoi(2000, graine = 42, nb_processus = nb_processus)
+        duree = time.time() - debut
+        print nb_processus, "processus :", "{:.1f} parties/s".format(2000 / duree)
+    print "points = ", resultats[1]['points']
+    print "champions = ", resultats[1]['champions']
+    print "identiques = ", all(r == resultats[1] for r in resultats.values())
+    print "belote arrêtée à +- 5 % de victoires"
+    from belote import Belote
+    for nb_processus in (1, cpu_count()):
+        resultat = tournoi(100000, graine = 42, nb_processus = nb_processus, classe_jeu = Belote,
+                           precision = 0.05, avec_partiels = False)
+        print nb_processus, "processus :", resultat['nb_parties'], "parties,", \
+              "victoires = ", resultat['statistiques']['victoires']['un']
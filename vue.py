@@ -17,6 +17,9 @@ logger = logging.getLogger("vue")
 # pas d'import du modèle, même s'il y a une dépendance.
 # expressions régulières pour le contrôle de la saisie
 import re
+# pour limiter la fréquence d'affichage et écrire en une fois
+import sys
+import time
 
 
 class Vue(object):
@@ -25,7 +28,7 @@ class Vue(object):
 
 class Console(Vue):
     """ Affiche dans un terminal en mode caractère """
-    def __init__(self, modele):
+    def __init__(self, modele, sortie = None, frequence = 0):
         """
         Mémorise l'objet à afficher : la table et
         Définit les façons de l'afficher ainsi que ses composants
@@ -35,25 +38,35 @@ class Console(Vue):
         # nombre de caractères en largeur et ligne en hauteur
         self.largeur = 80
 
+        # les affichages sont écrits en une fois dans la sortie
+        self.sortie = sortie if sortie is not None else sys.stdout
+        # nombre maximal d'affichages par seconde, 0 pour ne pas limiter
+        # (un spectateur de parties entre robots la limite, 25 par exemple)
+        self.frequence = frequence
+        self.dernier_affichage = 0.0
+        # les parties de la table à redessiner, et leur dernier affichage
+        self.a_redessiner = []
+        self.derniers_rendus = {}
+
         logger.info("Intialisation de la vue")
         
         # affichage du tapis
         def voir_tapis(un_tapis):
             # mise en forme en colonnes, un coup par ligne
-            vue = self.largeur*'-'
+            vue = [self.largeur*'-']
             # en dur la marge, arbitraire
             # mise en forme pour la carte puis le nom du jou[eur
             ligne = (self.largeur / 3 - self.l_max_carte)*' ' \
                     + "{carte:<" + str(self.l_max_carte) + "} {nom}\n"
             for coup in un_tapis:
-                vue = vue \
-                      + ligne.format(carte = repr(coup[1]), nom = coup[0].nom)
-            vue = vue + self.largeur*'.'
-            return vue
+                vue.append(ligne.format(carte = repr(coup[1]), nom = coup[0].nom))
+            vue.append(self.largeur*'.')
+            return ''.join(vue)
         self.modele.tapis.__class__.__repr__ = voir_tapis
         # mettre en place la surveillance du tapis
         def surveiller(un_event):
-            print repr(un_event.source)
+            # la fin d'une partie est toujours affichée sans attendre
+            self.redessiner(un_event.source, un_event.genre == 'partie')
         # en utilisant le fait que c'est un Observable
         self.modele.tapis.subscribe(surveiller)
 
@@ -62,7 +75,7 @@ class Console(Vue):
         self.l_max_points = 5
         def voir_points(une_feuille):
             # mise en forme en colonnes, un coup par ligne
-            vue = self.largeur*'*'
+            vue = [self.largeur*'*']
             
             # après que les gagnants ont été proclamés, ils sont affichés 
             if une_feuille.champions_changed:
@@ -71,15 +84,12 @@ class Console(Vue):
                 ligne = (self.largeur / 3 - self.l_max_points)*' ' \
                     + "{valeur:<" + str(self.l_max_points) + "} {nom}\n"
                 for joueur, points in une_feuille.iteritems():
-                    vue = vue \
-                      + ligne.format(valeur = repr(points), nom = joueur.nom)
+                    vue.append(ligne.format(valeur = repr(points), nom = joueur.nom))
                 # les gagnants
-                vue = vue + \
-                      "Les gagnants de la partie sont :".center(self.largeur) +\
-                      "\n"
-                vue = vue + \
-                      str([champion.nom for champion in une_feuille.champions]).\
-                      center(self.largeur)
+                vue.append("Les gagnants de la partie sont :".center(self.largeur))
+                vue.append("\n")
+                vue.append(str([champion.nom for champion in une_feuille.champions]).\
+                           center(self.largeur))
             else:
                 # après chaque donne, les totaux sont affichés,
                 # le détail des points de chaque donne devrait l'être aussi
@@ -88,11 +98,10 @@ class Console(Vue):
                 ligne = (self.largeur / 3 - self.l_max_points)*' ' \
                     + "{valeur:<" + str(self.l_max_points) + "} {nom}\n"
                 for joueur, points in une_feuille.iteritems():
-                    vue = vue \
-                      + ligne.format(valeur = repr(points), nom = joueur.nom)
+                    vue.append(ligne.format(valeur = repr(points), nom = joueur.nom))
                 
-            vue = vue + self.largeur*'*'
-            return vue
+            vue.append(self.largeur*'*')
+            return ''.join(vue)
         self.modele.feuille_de_points.__class__.__repr__ = voir_points
 
         # mettre en place la surveillance de la feuille
@@ -100,12 +109,10 @@ class Console(Vue):
         
         # affichage de la table
         def montrer(table):
-            vue = ""
-            for joueur in table.joueurs:
-                vue = vue + repr(joueur) + '\n'
-            vue = vue + repr(table.tapis)
-            vue = vue + repr(table.feuille_de_points)
-            return vue    
+            vue = [repr(joueur) + '\n' for joueur in table.joueurs]
+            vue.append(repr(table.tapis))
+            vue.append(repr(table.feuille_de_points))
+            return ''.join(vue)
         self.modele.__class__.__repr__ = montrer
 
     def personnaliser(self, table):
@@ -114,17 +121,19 @@ class Console(Vue):
 
         # affichage d'un joueur
         def montrer(joueur):
-            vue = "\t\t"
+            vue = ["\t\t"]
             for c in joueur.main:
                 # affichage d'une carte selon qu'elle est de dos ou de face
-                vue = vue + " " + (repr(c) if joueur.visible else "X")
-            vue = vue + "\t" + joueur.nom
-            return vue
+                vue.append(" " + (repr(c) if joueur.visible else "X"))
+            vue.append("\t" + joueur.nom)
+            return ''.join(vue)
 
         # Expression régulière qui contraint la saisie
         self.format_saisie = re.compile("^[1-8]\Z")
         def saisir(un_joueur, des_options):
             """permet à un joueur de choisir une carte à donner"""
+            # montrer la table à jour avant de demander
+            self.rafraichir(True)
             # proposer la saisie
             max = str(len(des_options))
             prompt = "Désigner une carte parmi " + repr(des_options) + \
@@ -170,8 +179,37 @@ class Console(Vue):
         # contraint l'existence d'au moins une carte dans la pioche
         table.pioche[0].__class__.__repr__ = voir_carte
 
+    def redessiner(self, region, immediat = False):
+        """ note qu'une partie de la table a changé et l'affiche si possible"""
+        if not any(r is region for r in self.a_redessiner):
+            self.a_redessiner.append(region)
+        self.rafraichir(immediat)
+
+    def rafraichir(self, immediat = False):
+        """
+        affiche les parties de la table qui ont changé depuis leur dernier affichage
+        sauf si le dernier affichage est trop récent
+        """
+        maintenant = time.time()
+        if not immediat and self.frequence and \
+           maintenant - self.dernier_affichage < 1.0 / self.frequence:
+            return
+        self.dernier_affichage = maintenant
+        tampon = []
+        for region in self.a_redessiner:
+            rendu = repr(region)
+            if self.derniers_rendus.get(id(region)) != rendu:
+                self.derniers_rendus[id(region)] = rendu
+                tampon.append(rendu)
+                tampon.append('\n')
+        del self.a_redessiner[:]
+        if tampon:
+            self.sortie.write(''.join(tampon))
+            self.sortie.flush()
+
     def afficher(self):
         """ affiche l'état courant d'ensemble"""
+        self.rafraichir(True)
         print repr(self.modele)        
 
 class Graphique(Vue):